@@ -1,39 +1,27 @@
+import time
+STARTED_AT = time.perf_counter() # Before the other imports, so the startup time report includes them
+
 import tkinter as tk
 import customtkinter as ctk
 from tkinter import filedialog, messagebox
-import json
-import random
 import os
+import threading
+
+import engine
+import storage
+import widgets
+from engine import Player
 
 ctk.set_appearance_mode("Dark")
 ctk.set_default_color_theme("blue")
 
-class Player:
-    # Represents a single player in the tournament.
-    def __init__(self, name, school, is_active=True, score=0.0, opponent_history=None,
-                 color_history=None, absent_count=0, had_pairing_bye=False, round_joined=1):
-        self.name = name
-        self.school = school
-        self.is_active = is_active
-        self.score = score
-        # Initialize lists to avoid mutable default argument issues
-        self.opponent_history = opponent_history if opponent_history is not None else []
-        self.color_history = color_history if color_history is not None else []
-        self.absent_count = absent_count
-        self.had_pairing_bye = had_pairing_bye
-        self.round_joined = round_joined
-
-    def to_dict(self):
-        # Converts player object's attributes into a dictionary for JSON serialization.
-        return self.__dict__
-
-    @classmethod
-    def from_dict(cls, data):
-        # Creates a Player object from a dictionary.
-        return cls(**data)
-
-    def __repr__(self):
-        return f"Player({self.name}, {self.school}, Score: {self.score})"
+ALL_FILTER = "All" # Roster filter value that matches everyone
+AUTOSAVE_DELAY_MS = 1000 # Wait this long after a change so a burst of changes is autosaved once
+AUTOSAVE_CHECK_MS = 2000 # Check this long after an autosave that it could be written
+# Set this environment variable to print how long the window took to start ("exit" also closes it again)
+STARTUP_TIMING_ENV = "CTM_STARTUP_TIMING"
+PAIRING_POLL_MS = 100 # How often the window checks on pairings being made in the background
+IMPORT_CHUNK_DELAY_MS = 1 # Pause between chunks of a player import so the window keeps redrawing
 
 class TournamentApp(ctk.CTk):
     # The main application class for the Chess Club Tournament Manager GUI.
@@ -43,34 +31,59 @@ class TournamentApp(ctk.CTk):
         self.title("Chess Club Tournament Manager")
         self.geometry("1200x850")
 
-        self.players = []
-        self.current_round = 1
+        self.tournament = engine.Tournament() # Players, current round and pairings
         self.filename = None
-        self.pairings_data = {} # Stores pairings for the current round
+        self.journal = None # Logs every change to the open file so nothing is lost in a crash
+        self.autosave_path = storage.default_autosave_path()
+        self.autosave_writer = storage.BackgroundWriter() # Writes autosaves off the main loop
+        self.autosave_job = None # Pending after() call for the next autosave
+        self.autosave_check_job = None # Pending after() call to check the last autosave was written
+        self.autosave_failure_shown = False # The user was told autosaving failed; cleared once it works again
 
         self.unsaved_changes = False # Flag to track unsaved modifications
 
         self.grid_columnconfigure(0, weight=1)
         self.grid_rowconfigure(0, weight=1)
 
-        self.tabview = ctk.CTkTabview(self, width=250)
+        self.result_boards = {} # Each bracket's boards and entered results for the current round
+        self.selected_player = None
+        self.pairing_task = None # The engine.PairingTask running on a worker thread, if any
+
+        self.tabview = ctk.CTkTabview(self, width=250, command=self._on_tab_changed)
         self.tabview.grid(row=0, column=0, padx=20, pady=20, sticky="nsew")
 
         self.tabview.add("Player Management")
         self.tabview.add("Tournament")
         self.tabview.add("Help & Rules")
 
+        # Only the roster tab (shown first) is built now; the others are built the first time they are opened
+        self.tournament_tab_built = False
+        self.tab_builders = {"Tournament": self.create_tournament_tab, "Help & Rules": self.create_help_tab}
         self.create_player_management_tab()
-        self.create_tournament_tab()
-        self.create_help_tab()
 
-        self.result_widgets = {} # Stores UI widgets for result entry for the current round
-        self.selected_player = None
-        self.selected_button = None
+        self.after(100, self._offer_autosave_restore)
+        if os.environ.get(STARTUP_TIMING_ENV):
+            self.after_idle(self._report_startup_time)
 
         self.protocol("WM_DELETE_WINDOW", self.on_closing) # Intercept window close event
+        self.bind("<Control-z>", lambda event: self.undo_change())
+        self.bind("<Control-y>", lambda event: self.redo_change())
         self.update_tournament_button_states() # Set initial state of tournament buttons
 
+    def _on_tab_changed(self):
+        # Builds a tab the first time it is shown.
+        builder = self.tab_builders.pop(self.tabview.get(), None)
+        if builder:
+            builder()
+
+    def _report_startup_time(self):
+        # Prints the time from starting the program to the first drawn window (see STARTUP_TIMING_ENV).
+        self.update_idletasks()
+        print(f"Startup time: {(time.perf_counter() - STARTED_AT) * 1000:.0f} ms")
+        if os.environ.get(STARTUP_TIMING_ENV) == "exit":
+            self.autosave_writer.stop(flush=False)
+            self.destroy()
+
     def create_player_management_tab(self):
         # Sets up the 'Player Management' tab with widgets for adding, managing, and importing/exporting player data.
         pm_tab = self.tabview.tab("Player Management")
@@ -86,10 +99,14 @@ class TournamentApp(ctk.CTk):
         ctk.CTkLabel(add_player_frame, text="Add New Player", font=ctk.CTkFont(size=14, weight="bold")).pack(pady=(0,10))
         self.player_name_entry = ctk.CTkEntry(add_player_frame, placeholder_text="Player Name")
         self.player_name_entry.pack(pady=5, fill="x")
-        self.school_var = tk.StringVar(value="Middle School") # Variable for school type radio buttons
-
-        ctk.CTkRadioButton(add_player_frame, text="Middle School", variable=self.school_var, value="Middle School").pack(anchor="w", padx=10, pady=2)
-        ctk.CTkRadioButton(add_player_frame, text="High School", variable=self.school_var, value="High School").pack(anchor="w", padx=10, pady=2)
+        self.player_rating_entry = ctk.CTkEntry(add_player_frame, placeholder_text="Rating (optional)")
+        self.player_rating_entry.pack(pady=5, fill="x")
+        self.player_team_entry = ctk.CTkEntry(add_player_frame, placeholder_text="Team or family (optional)")
+        self.player_team_entry.pack(pady=5, fill="x")
+        self.school_var = tk.StringVar(value=self.tournament.bracket_names()[0]) # Variable for school type radio buttons
+        self.school_options_frame = ctk.CTkFrame(add_player_frame, fg_color="transparent")
+        self.school_options_frame.pack(fill="x")
+        self._build_school_options()
         ctk.CTkButton(add_player_frame, text="Add Player", command=self.add_player).pack(pady=10, fill="x")
 
         manage_frame = ctk.CTkFrame(left_frame)
@@ -97,6 +114,7 @@ class TournamentApp(ctk.CTk):
         ctk.CTkLabel(manage_frame, text="Manage Selected Player", font=ctk.CTkFont(size=14, weight="bold")).pack(pady=(0,10))
         ctk.CTkButton(manage_frame, text="Set as INACTIVE", command=self.set_player_status_inactive).pack(pady=5, fill="x")
         ctk.CTkButton(manage_frame, text="Set as ACTIVE", command=self.set_player_status_active).pack(pady=5, fill="x")
+        ctk.CTkButton(manage_frame, text="Rename Player", command=self.rename_player).pack(pady=5, fill="x")
         ctk.CTkButton(manage_frame, text="Delete Player", fg_color="#D32F2F", hover_color="#B71C1C", command=self.delete_player).pack(pady=5, fill="x")
 
         file_frame = ctk.CTkFrame(left_frame)
@@ -104,12 +122,44 @@ class TournamentApp(ctk.CTk):
         ctk.CTkLabel(file_frame, text="File Operations", font=ctk.CTkFont(size=14, weight="bold")).pack(pady=(0,10))
         ctk.CTkButton(file_frame, text="Import Tournament (.json)", command=self.import_data).pack(pady=5, fill="x")
         ctk.CTkButton(file_frame, text="Export Tournament (.json)", command=self.export_data).pack(pady=5, fill="x")
+        self.import_players_button = ctk.CTkButton(file_frame, text="Import Players (.csv)", command=self.import_players)
+        self.import_players_button.pack(pady=5, fill="x")
 
         player_list_frame = ctk.CTkFrame(pm_tab)
         player_list_frame.grid(row=0, column=1, sticky="nsew")
         ctk.CTkLabel(player_list_frame, text="Current Player Roster", font=ctk.CTkFont(size=16, weight="bold")).pack(pady=10)
-        self.player_scroll_frame = ctk.CTkScrollableFrame(player_list_frame)
-        self.player_scroll_frame.pack(expand=True, fill="both", padx=10, pady=10)
+
+        filter_frame = ctk.CTkFrame(player_list_frame, fg_color="transparent")
+        filter_frame.pack(fill="x", padx=10)
+        self.player_search_entry = ctk.CTkEntry(filter_frame, placeholder_text="Search by name")
+        self.player_search_entry.pack(side="left", expand=True, fill="x", padx=(0, 10))
+        self.player_search_entry.bind("<KeyRelease>", lambda event: self.update_player_list_frame())
+        self.school_filter_var = tk.StringVar(value=ALL_FILTER)
+        self.school_filter_menu = ctk.CTkOptionMenu(filter_frame, variable=self.school_filter_var,
+                                                    values=[ALL_FILTER] + self.tournament.bracket_names(),
+                                                    command=lambda value: self.update_player_list_frame())
+        self.school_filter_menu.pack(side="left", padx=(0, 10))
+        self.status_filter_var = tk.StringVar(value=ALL_FILTER)
+        ctk.CTkSegmentedButton(filter_frame, values=[ALL_FILTER, "Active", "Inactive"], variable=self.status_filter_var,
+                               command=lambda value: self.update_player_list_frame()).pack(side="left")
+
+        # Only the rows on screen are real widgets, so large rosters stay fast
+        self.player_list = widgets.VirtualList(player_list_frame, render_row=self._player_row_text, on_select=self.select_player)
+        self.player_list.pack(expand=True, fill="both", padx=10, pady=10)
+
+    def _build_school_options(self):
+        # Creates one radio button per bracket for choosing a new player's school.
+        for widget in self.school_options_frame.winfo_children():
+            widget.destroy()
+        brackets = self.tournament.bracket_names()
+        if self.school_var.get() not in brackets:
+            self.school_var.set(brackets[0])
+        if hasattr(self, 'school_filter_menu'):
+            self.school_filter_menu.configure(values=[ALL_FILTER] + brackets)
+            if self.school_filter_var.get() not in brackets:
+                self.school_filter_var.set(ALL_FILTER)
+        for bracket in brackets:
+            ctk.CTkRadioButton(self.school_options_frame, text=bracket, variable=self.school_var, value=bracket).pack(anchor="w", padx=10, pady=2)
 
     def create_tournament_tab(self):
         # Sets up the 'Tournament' tab with controls for generating pairings, submitting results, and displaying match information.
@@ -120,44 +170,55 @@ class TournamentApp(ctk.CTk):
         control_frame = ctk.CTkFrame(self.tourney_tab)
         control_frame.grid(row=0, column=0, padx=10, pady=10, sticky="ew")
 
-        self.round_label = ctk.CTkLabel(control_frame, text=f"Current Round: {self.current_round}", font=ctk.CTkFont(size=16, weight="bold"))
+        self.round_label = ctk.CTkLabel(control_frame, text=f"Current Round: {self.tournament.current_round}", font=ctk.CTkFont(size=16, weight="bold"))
         self.round_label.pack(side="left", padx=20)
+        self.undo_button = ctk.CTkButton(control_frame, text="Undo", width=70, command=self.undo_change)
+        self.undo_button.pack(side="left", padx=(0, 5))
+        self.redo_button = ctk.CTkButton(control_frame, text="Redo", width=70, command=self.redo_change)
+        self.redo_button.pack(side="left")
+        # Shown while pairings are being made
+        self.pairing_progress_frame = ctk.CTkFrame(control_frame, fg_color="transparent")
+        ctk.CTkLabel(self.pairing_progress_frame, text="Pairing...").pack(side="left", padx=(0, 5))
+        self.pairing_progress = ctk.CTkProgressBar(self.pairing_progress_frame, width=150)
+        self.pairing_progress.pack(side="left", padx=(0, 5))
+        ctk.CTkButton(self.pairing_progress_frame, text="Cancel", width=70, command=self.cancel_pairing).pack(side="left")
 
         self.submit_results_button = ctk.CTkButton(control_frame, text="Submit Results & Finalize Round", command=self.submit_results)
         self.submit_results_button.pack(side="right", padx=10)
         self.generate_pairings_button = ctk.CTkButton(control_frame, text="Generate Pairings for Next Round", command=self.generate_pairings_for_round)
         self.generate_pairings_button.pack(side="right", padx=10)
+        self.pairing_mode_var = tk.StringVar(value=engine.GREEDY) # Which pairing method to use
+        ctk.CTkSegmentedButton(control_frame, values=list(engine.PAIRING_MODES), variable=self.pairing_mode_var).pack(side="right", padx=10)
+        ctk.CTkLabel(control_frame, text="Pairing Mode:").pack(side="right")
 
         self.tourney_display_container = ctk.CTkFrame(self.tourney_tab, fg_color="transparent")
         self.tourney_display_container.grid(row=1, column=0, padx=10, pady=10, sticky="nsew")
-        self.tourney_display_container.grid_columnconfigure(0, weight=1)
-        self.tourney_display_container.grid_columnconfigure(1, weight=1)
         self.tourney_display_container.grid_rowconfigure(0, weight=1)
         self._build_tournament_display()
+        self.tournament_tab_built = True
+        self.rebuild_ui_from_saved_state() # Show pairings made before the tab was first opened
 
     def _build_tournament_display(self):
-        # Creates the UI elements for displaying pairings and entering results for both Middle School and High School brackets.
-        ms_container = ctk.CTkFrame(self.tourney_display_container)
-        ms_container.grid(row=0, column=0, padx=(0, 5), pady=0, sticky="nsew")
-        ms_container.grid_rowconfigure(1, weight=1); ms_container.grid_rowconfigure(2, weight=2)
-        ms_container.grid_columnconfigure(0, weight=1)
-        ctk.CTkLabel(ms_container, text="Middle School Bracket", font=ctk.CTkFont(size=14, weight="bold")).grid(row=0, column=0, pady=5)
-        self.ms_results_textbox = ctk.CTkTextbox(ms_container, wrap="word", font=("Courier New", 12))
-        self.ms_results_textbox.grid(row=1, column=0, sticky="nsew", padx=5, pady=(0,5))
-        self.ms_results_textbox.configure(state="disabled")
-        self.ms_results_frame = ctk.CTkScrollableFrame(ms_container, label_text="Enter Results")
-        self.ms_results_frame.grid(row=2, column=0, sticky="nsew", padx=5, pady=(5,5))
-
-        hs_container = ctk.CTkFrame(self.tourney_display_container)
-        hs_container.grid(row=0, column=1, padx=(5, 0), pady=0, sticky="nsew")
-        hs_container.grid_rowconfigure(1, weight=1); hs_container.grid_rowconfigure(2, weight=2)
-        hs_container.grid_columnconfigure(0, weight=1)
-        ctk.CTkLabel(hs_container, text="High School Bracket", font=ctk.CTkFont(size=14, weight="bold")).grid(row=0, column=0, pady=5)
-        self.hs_results_textbox = ctk.CTkTextbox(hs_container, wrap="word", font=("Courier New", 12))
-        self.hs_results_textbox.grid(row=1, column=0, sticky="nsew", padx=5, pady=(0,5))
-        self.hs_results_textbox.configure(state="disabled")
-        self.hs_results_frame = ctk.CTkScrollableFrame(hs_container, label_text="Enter Results")
-        self.hs_results_frame.grid(row=2, column=0, sticky="nsew", padx=5, pady=(5,5))
+        # Creates the UI elements for displaying pairings and entering results, one column per bracket.
+        self.bracket_textboxes = {}
+        self.bracket_result_lists = {}
+        brackets = self.tournament.bracket_names()
+        for column, bracket in enumerate(brackets):
+            self.tourney_display_container.grid_columnconfigure(column, weight=1)
+            container = ctk.CTkFrame(self.tourney_display_container)
+            container.grid(row=0, column=column, padx=(0 if column == 0 else 5, 0 if column == len(brackets) - 1 else 5), pady=0, sticky="nsew")
+            container.grid_rowconfigure(1, weight=1); container.grid_rowconfigure(2, weight=2)
+            container.grid_columnconfigure(0, weight=1)
+            ctk.CTkLabel(container, text=f"{bracket} Bracket", font=ctk.CTkFont(size=14, weight="bold")).grid(row=0, column=0, pady=5)
+            textbox = ctk.CTkTextbox(container, wrap="word", font=("Courier New", 12))
+            textbox.grid(row=1, column=0, sticky="nsew", padx=5, pady=(0,5))
+            textbox.configure(state="disabled")
+            # Result rows are pooled and reused, so even a bracket with hundreds of boards only has a screenful of widgets
+            result_list = widgets.ResultList(container, label_text="Enter Results",
+                                             on_change=lambda board, b=bracket: self._on_result_entered(b, board))
+            result_list.grid(row=2, column=0, sticky="nsew", padx=5, pady=(5,5))
+            self.bracket_textboxes[bracket] = textbox
+            self.bracket_result_lists[bracket] = result_list
 
     def create_help_tab(self):
         # Sets up the Help & Rules tab with a read-only text box containing instructions and tournament rules.
@@ -166,39 +227,8 @@ class TournamentApp(ctk.CTk):
         help_tab.grid_rowconfigure(0, weight=1)
         help_textbox = ctk.CTkTextbox(help_tab, wrap="word", font=("Segoe UI", 13))
         help_textbox.grid(row=0, column=0, sticky="nsew", padx=10, pady=10)
-        help_content = """
-# --- HOW TO USE THE PROGRAM ---
-
-# 1.  Player Management Tab:
-#     - Add Players: Enter a player's name, select their school (Middle/High), and click "Add Player". New players can be added at any time.
-#     - Manage Players: Select a player from the list on the right. You can then mark them as "Inactive" (if they leave the club) or "Active". Inactive players will automatically receive absent byes and will not be present in any newly generated pairings.
-#     - Import/Export: Use the buttons to save your current tournament progress to a .json file or load a previous tournament. ALWAYS export your progress when you are done.
-
-# 2.  Tournament Tab:
-#     - Generate Pairings: Once players are added, click "Generate Pairings for Next Round". This will use the pairing logic to create matches for both brackets.
-#     - View Pairings & Enter Results: The pairings will appear in the text boxes. You can copy this text to a Google Doc. Below the pairings, controls will appear to enter results.
-#     - Mark Absences: For players who did not show up, check the "Absent" box next to their name.
-#     - Submit Results: After setting all results (Win/Loss/Draw) and marking any absences, click "Submit Results & Finalize Round". This will calculate scores, update player histories, and prepare for the next round.
-
-# --- PAIRING LOGIC PRIORITY ---
-
-# The program uses a Swiss-style pairing system with the following priorities:
-
-# 1.  Score Matching: Players are primarily paired against others in the same score group. The system works down from the top score.
-# 2.  Opponent History: The system prioritizes pairing players who have NOT played each other before. If no such pairing is possible, it will allow a rematch and favor opponents played least often or least recently.
-# 3.  Color Balancing: The system tries to give players the color they have played less. If they have played an equal number of games as White and Black, it will try to alternate from their last game.
-# 4.  Randomness: If multiple opponents are equally valid after the above rules, one is chosen randomly.
-
-# --- SCORING AND RULES ---
-
-# -   Win: 1.0 point
-# -   Draw: 0.5 points
-# -   Loss: 0.0 points
-# -   Pairing Bye: 1.0 point. This happens when there is an odd number of players. A player cannot receive a pairing bye two rounds in a row.
-# -   Absent Bye: 0.5 points. This is awarded when a player is marked "Absent". A player will only receive points for their first THREE absences. After that, absences are worth 0 points.
-# -   Inactive Players: Automatically receive absent byes each round.
-        """
-        help_textbox.insert("1.0", help_content)
+        import help_text # Only loaded when the tab is first opened
+        help_textbox.insert("1.0", help_text.HELP_TEXT)
         help_textbox.configure(state="disabled")
 
     def add_player(self):
@@ -208,38 +238,63 @@ class TournamentApp(ctk.CTk):
         if not name:
             messagebox.showerror("Error", "Player name cannot be empty.")
             return
-        if any(p.name.lower() == name.lower() for p in self.players):
+        if self.tournament.index.get_folded(name):
             messagebox.showerror("Error", "A player with this name already exists.")
             return
-        new_player = Player(name, school, round_joined=self.current_round)
-        self.players.append(new_player)
+        rating_text = self.player_rating_entry.get().strip()
+        rating = None
+        if rating_text:
+            if not rating_text.isdigit():
+                messagebox.showerror("Error", "The rating must be a whole number (or left empty).")
+                return
+            rating = int(rating_text)
+        team = self.player_team_entry.get().strip() or None
+        new_player = Player(name, school, round_joined=self.tournament.current_round, rating=rating, team=team)
+        self.tournament.add_player(new_player)
+        self._record_change('add_player', player=new_player.to_dict())
         self.player_name_entry.delete(0, "end")
+        self.player_rating_entry.delete(0, "end")
+        self.player_team_entry.delete(0, "end")
         self.update_player_list_frame()
         self.unsaved_changes = True
         self.update_tournament_button_states()
 
+    def _player_row_text(self, player):
+        status = "ACTIVE" if player.is_active else "INACTIVE"
+        rating = f" | Rating: {player.rating}" if player.rating is not None else ""
+        team = f", {player.team}" if player.team else ""
+        return f"{player.name} ({player.school}{team})\nScore: {player.score}{rating} | Absences: {player.absent_count} | Status: {status}"
+
+    def _player_matches_filter(self, player):
+        # Checks a player against the roster's search box and school/status filters.
+        search = self.player_search_entry.get().strip().casefold()
+        if search and search not in player.name.casefold():
+            return False
+        school = self.school_filter_var.get()
+        if school != ALL_FILTER and player.school != school:
+            return False
+        status = self.status_filter_var.get()
+        if status != ALL_FILTER and player.is_active != (status == "Active"):
+            return False
+        return True
+
     def update_player_list_frame(self):
-        # Refreshes the scrollable frame displaying the list of players.
-        for widget in self.player_scroll_frame.winfo_children():
-            widget.destroy()
-        self.selected_player = None
-        self.selected_button = None
-        sorted_players = sorted(self.players, key=lambda p: (p.school, p.name))
-        for player in sorted_players:
-            status = "ACTIVE" if player.is_active else "INACTIVE"
-            display_text = f"{player.name} ({player.school})\nScore: {player.score} | Absences: {player.absent_count} | Status: {status}"
-            btn = ctk.CTkButton(self.player_scroll_frame, text=display_text, anchor="w")
-            # Pass the button itself to the command to allow selection highlighting
-            btn.configure(command=lambda p=player, b=btn: self.select_player(p, b))
-            btn.pack(pady=2, padx=5, fill="x")
-
-    def select_player(self, player, button):
-        # Highlights the selected player's button and stores the player object.
-        if self.selected_button and self.selected_button.winfo_exists():
-            self.selected_button.configure(fg_color=ctk.ThemeManager.theme["CTkButton"]["fg_color"])
+        # Refreshes the roster list with the players that match the current filters.
+        shown_players = sorted((p for p in self.tournament.players if self._player_matches_filter(p)), key=lambda p: (p.school, p.name))
+        empty_text = "No players match the filters." if self.tournament.players else "No players yet."
+        self.player_list.set_items(shown_players, empty_text)
+        self.selected_player = self.player_list.selected
+
+    def refresh_player(self, player):
+        # Updates one player's row in place, unless the change moves them in or out of the filter.
+        if self._player_matches_filter(player):
+            self.player_list.refresh_item(player)
+        else:
+            self.update_player_list_frame()
+
+    def select_player(self, player):
+        # Stores the player whose row was clicked (the list highlights it).
         self.selected_player = player
-        self.selected_button = button
-        self.selected_button.configure(fg_color=ctk.ThemeManager.theme["CTkButton"]["hover_color"])
 
     def get_selected_player(self):
         # Returns the currently selected player or shows an error if none is selected.
@@ -252,10 +307,11 @@ class TournamentApp(ctk.CTk):
         # Sets the selected player's status to inactive.
         player = self.get_selected_player()
         if player:
-            player.is_active = False
-            self.update_player_list_frame()
+            self.tournament.set_status(player, False)
+            self._record_change('set_status', name=player.name, is_active=False)
+            self.refresh_player(player)
             # Pairings exist for current round
-            if self.result_widgets:
+            if self.tournament.pairings_data:
                 messagebox.showinfo("Player Status Updated",
                                     f"'{player.name}' has been marked as INACTIVE. This change will apply to future pairings. For the current round, please manually mark them 'Absent' if needed.")
             else:
@@ -266,25 +322,51 @@ class TournamentApp(ctk.CTk):
         # Sets the selected player's status to active.
         player = self.get_selected_player()
         if player:
-            player.is_active = True
-            self.update_player_list_frame()
+            self.tournament.set_status(player, True)
+            self._record_change('set_status', name=player.name, is_active=True)
+            self.refresh_player(player)
             # Pairings exist for current round
-            if self.result_widgets:
+            if self.tournament.pairings_data:
                 messagebox.showinfo("Player Status Updated",
                                     f"'{player.name}' has been marked as ACTIVE. This change will apply to future pairings. Their status for the current round's pairings (if any) remains as it was when pairings were generated.")
             else:
                 messagebox.showinfo("Player Status Updated", f"'{player.name}' has been marked as ACTIVE.")
             self.unsaved_changes = True
 
+    def rename_player(self):
+        # Renames the selected player. Their game history, and other players' history against
+        # them, follow the new name.
+        player = self.get_selected_player()
+        if not player:
+            return
+        new_name = ctk.CTkInputDialog(text=f"New name for '{player.name}':", title="Rename Player").get_input()
+        if new_name is None: return
+        new_name = new_name.strip()
+        if not new_name:
+            messagebox.showerror("Error", "Player name cannot be empty.")
+            return
+        old_name = player.name
+        try:
+            self.tournament.rename_player(player, new_name)
+        except ValueError as e:
+            messagebox.showerror("Error", str(e))
+            return
+        self._record_change('rename_player', name=old_name, new_name=new_name)
+        self.update_player_list_frame()
+        if self.tournament_tab_built:
+            self.rebuild_ui_from_saved_state() # The name may appear in the current pairings
+        self.unsaved_changes = True
+
     def delete_player(self):
         # Deletes the selected player after confirmation.
-        if self.result_widgets:
+        if self.tournament.pairings_data:
             messagebox.showerror("Error", "Cannot delete player while there are pending pairings/results. Please submit the current round first.")
             return
         player = self.get_selected_player()
         if player:
             if messagebox.askyesno("Confirm Deletion", f"Are you sure you want to permanently delete '{player.name}'?"):
-                self.players.remove(player)
+                self.tournament.remove_player(player)
+                self._record_change('remove_player', name=player.name)
                 self.update_player_list_frame()
                 messagebox.showinfo("Success", f"'{player.name}' has been deleted.")
                 self.unsaved_changes = True
@@ -295,35 +377,157 @@ class TournamentApp(ctk.CTk):
         filepath = filedialog.askopenfilename(filetypes=[("JSON Files", "*.json")])
         if not filepath: return
         try:
-            with open(filepath, 'r') as f: data = json.load(f)
-            self.players = [Player.from_dict(p_data) for p_data in data['players']]
-            self.current_round = data['current_round']
-            self.pairings_data = data.get('pairings_data', {})
+            tournament, seq, recovered_changes = storage.load(filepath)
+            try:
+                journal = storage.Journal(filepath, tournament, seq)
+            except OSError as e: # E.g. a write-protected USB stick; the file can still be used
+                journal = None
+                messagebox.showwarning("Read-Only File", f"Changes to {os.path.basename(filepath)} can't be recorded as you make them, so they'll only be kept if you export the tournament.\nError: {e}")
+            if self.journal: self.journal.close()
+            self.journal = journal
+            self.tournament = tournament
             self.filename = filepath
-            self.update_player_list_frame()
-            self.round_label.configure(text=f"Current Round: {self.current_round}")
-            self.rebuild_ui_from_saved_state()
+            self._refresh_loaded_tournament()
             messagebox.showinfo("Success", f"Tournament loaded from {os.path.basename(filepath)}")
             self.unsaved_changes = False # State now matches the saved file
+            if recovered_changes:
+                messagebox.showinfo("Recovered Changes", f"{recovered_changes} change(s) made after this file was last exported were recovered. Export the tournament to keep them.")
+                self.unsaved_changes = True
             self.update_tournament_button_states()
         except Exception as e:
             messagebox.showerror("Import Error", f"Failed to load file.\nError: {e}")
 
+    def import_players(self):
+        # Adds the players listed in a CSV file (see registration.py). The file is read a chunk
+        # at a time between redraws, and the players are added together once it has all been read.
+        filepath = filedialog.askopenfilename(filetypes=[("CSV Files", "*.csv"), ("Text Files", "*.txt"), ("All Files", "*.*")])
+        if not filepath: return
+        import registration # Only needed when importing
+        try:
+            f = registration.open_csv(filepath)
+            roster_import = registration.RosterImport(self.tournament, f, default_school=self.school_var.get())
+        except (OSError, ValueError) as e:
+            messagebox.showerror("Import Error", f"Failed to read file.\nError: {e}")
+            return
+        self.import_players_button.configure(state="disabled", text="Importing...")
+        self._read_import_chunk(roster_import, f, os.path.basename(filepath))
+
+    def _read_import_chunk(self, roster_import, f, filename):
+        try:
+            if roster_import.read_chunk():
+                self.import_players_button.configure(text=f"Importing... ({roster_import.rows_read} rows)")
+                self.after(IMPORT_CHUNK_DELAY_MS, self._read_import_chunk, roster_import, f, filename)
+                return
+        except (OSError, ValueError) as e:
+            f.close()
+            self.import_players_button.configure(state="normal", text="Import Players (.csv)")
+            messagebox.showerror("Import Error", f"Failed to read {filename}.\nError: {e}")
+            return
+        f.close()
+        self.import_players_button.configure(state="normal", text="Import Players (.csv)")
+        if roster_import.tournament is not self.tournament:
+            messagebox.showerror("Import Error", "A different tournament was loaded while the players were being read. Nothing was imported.")
+            return
+        new_brackets = roster_import.new_brackets()
+        if new_brackets and not messagebox.askyesno("New Sections",
+                f"{filename} lists players in section(s) the tournament doesn't have yet: {', '.join(new_brackets)}. Import them anyway?"):
+            return
+        players = roster_import.commit()
+        if players:
+            self._record_change('add_players', players=[p.to_dict() for p in players])
+            self._refresh_loaded_tournament() # New players may bring new brackets
+            self.unsaved_changes = True
+            self.update_tournament_button_states()
+        messagebox.showinfo("Import Players", roster_import.summary())
+
+    def _refresh_loaded_tournament(self):
+        # Rebuilds every part of the UI after self.tournament has been replaced.
+        self._build_school_options()
+        self.update_player_list_frame()
+        if self.tournament_tab_built:
+            if self.pairing_task:
+                self._stop_pairing() # It was pairing the tournament that was just replaced
+            self._clear_and_rebuild_tournament_ui() # The loaded tournament may have different brackets
+            self.round_label.configure(text=f"Current Round: {self.tournament.current_round}")
+            self.rebuild_ui_from_saved_state()
+
+    def _offer_autosave_restore(self):
+        # An autosave left behind on startup means the program didn't close normally last time.
+        if not os.path.exists(self.autosave_path):
+            return
+        try:
+            tournament, _, _ = storage.load(self.autosave_path)
+        except Exception as e:
+            messagebox.showwarning("Autosave", f"The autosave from last time could not be read, so it can't be restored.\nError: {e}")
+            return
+        if not tournament.players:
+            return
+        if messagebox.askyesno("Restore Autosave",
+                               f"The program did not close normally last time. Restore the autosaved tournament (Round {tournament.current_round}, {len(tournament.players)} players)?"):
+            self.tournament = tournament
+            self._refresh_loaded_tournament()
+            self.unsaved_changes = True # The autosave isn't the user's own file
+            self.update_tournament_button_states()
+
+    def _schedule_autosave(self):
+        # Restarts the autosave timer, so a burst of changes leads to one autosave.
+        if self.autosave_job:
+            self.after_cancel(self.autosave_job)
+        self.autosave_job = self.after(AUTOSAVE_DELAY_MS, self._autosave)
+
+    def _autosave(self):
+        # Copies the state here on the main loop; the JSON encoding and disk write happen
+        # on the writer thread, so the window never waits for the disk.
+        self.autosave_job = None
+        self.autosave_writer.submit(self.autosave_path, self.tournament.snapshot())
+        if self.autosave_check_job:
+            self.after_cancel(self.autosave_check_job)
+        self.autosave_check_job = self.after(AUTOSAVE_CHECK_MS, self._check_autosave)
+
+    def _check_autosave(self):
+        # Tells the user if autosaving failed (e.g. a full disk), once until it works again,
+        # since without it a crash would lose their changes.
+        self.autosave_check_job = None
+        error = self.autosave_writer.last_error
+        if error is None:
+            self.autosave_failure_shown = False
+        elif not self.autosave_failure_shown:
+            self.autosave_failure_shown = True
+            messagebox.showwarning("Autosave Failed", f"The tournament could not be autosaved to {self.autosave_path}, so it can't be restored if the program closes unexpectedly. Export it to keep your changes safe.\nError: {error}")
+
+    def _close(self):
+        # Stops autosaving and removes the autosave file, since the program is closing normally.
+        if self.autosave_job:
+            self.after_cancel(self.autosave_job)
+        if self.autosave_check_job:
+            self.after_cancel(self.autosave_check_job)
+        if self.pairing_task:
+            self.pairing_task.cancel()
+        self.autosave_writer.stop(flush=False)
+        if os.path.exists(self.autosave_path):
+            try:
+                os.remove(self.autosave_path)
+            except OSError:
+                pass
+        self.destroy()
+
     def export_data(self):
         # Saves current tournament data to a JSON file.
-        if not self.players:
+        if not self.tournament.players:
             messagebox.showwarning("Export Warning", "There are no players to export.")
             return False
         filepath = filedialog.asksaveasfilename(defaultextension=".json", filetypes=[("JSON Files", "*.json")],
-                                                initialfile=f"tournament_round_{self.current_round}.json")
+                                                initialfile=f"tournament_round_{self.tournament.current_round}.json")
         if not filepath: return False
-        data = {
-            'current_round': self.current_round,
-            'players': [p.to_dict() for p in self.players],
-            'pairings_data': self.pairings_data
-        }
         try:
-            with open(filepath, 'w') as f: json.dump(data, f, indent=4)
+            if self.journal:
+                if os.path.abspath(self.journal.path) == os.path.abspath(filepath):
+                    self.journal.close()
+                else:
+                    # The old file stays as it was last exported; its changes are in the new one
+                    self.journal.discard()
+            self.journal = None
+            self.journal = storage.Journal.create(filepath, self.tournament)
             self.filename = filepath
             messagebox.showinfo("Success", f"Tournament state saved to {os.path.basename(filepath)}")
             self.unsaved_changes = False # Changes are now saved
@@ -332,391 +536,244 @@ class TournamentApp(ctk.CTk):
             messagebox.showerror("Export Error", f"Failed to save file.\nError: {e}")
             return False
 
+    def _record_change(self, kind, **data):
+        # Appends a change to the open file's journal (see storage.py), if a file is open,
+        # and schedules an autosave.
+        self._schedule_autosave()
+        self.update_undo_buttons()
+        if not self.journal:
+            return
+        try:
+            self.journal.record(kind, **data)
+        except OSError as e:
+            messagebox.showerror("Save Error", f"Failed to record the change in {os.path.basename(self.filename)}.\nError: {e}")
+
+    def undo_change(self):
+        # Reverses the last change (Ctrl+Z). Undoing a submitted round asks first.
+        if not self.tournament.undo_stack or self.pairing_task:
+            return
+        kind, data = self.tournament.undo_stack[-1]
+        if kind == 'rollback_round' and not messagebox.askyesno("Undo Round",
+                f"Undo the results of Round {data['round']}? Its pairings and results will be restored so you can correct them and submit again."):
+            return
+        self._show_undo_redo(self.tournament.undo())
+
+    def redo_change(self):
+        # Makes the last undone change again (Ctrl+Y).
+        if self.tournament.redo_stack and not self.pairing_task:
+            self._show_undo_redo(self.tournament.redo())
+
+    def _show_undo_redo(self, change):
+        # Journals an undone or redone change and refreshes the whole window to match.
+        kind, data = change
+        self._record_change(kind, **data)
+        self._refresh_loaded_tournament()
+        self.unsaved_changes = True
+        self.update_tournament_button_states()
+
+    def update_undo_buttons(self):
+        if not self.tournament_tab_built:
+            return
+        self.undo_button.configure(state="normal" if self.tournament.undo_stack and not self.pairing_task else "disabled")
+        self.redo_button.configure(state="normal" if self.tournament.redo_stack and not self.pairing_task else "disabled")
+
     def _clear_and_rebuild_tournament_ui(self):
-        # Clears the tournament display area and rebuilds it.
+        # Clears the tournament display area. The bracket columns are only rebuilt when the
+        # brackets themselves have changed; otherwise their widgets are emptied and reused.
+        self.result_boards = {}
+        if list(self.bracket_textboxes) == self.tournament.bracket_names():
+            for bracket, textbox in self.bracket_textboxes.items():
+                textbox.configure(state="normal")
+                textbox.delete("1.0", "end")
+                textbox.configure(state="disabled")
+                self.bracket_result_lists[bracket].set_items([])
+            return
         for widget in self.tourney_display_container.winfo_children():
             widget.destroy()
-        self.result_widgets = {}
+        for column in range(len(self.bracket_textboxes)):
+            self.tourney_display_container.grid_columnconfigure(column, weight=0)
         self._build_tournament_display()
 
     def generate_pairings_for_round(self):
         # Generates pairings for the current round based on player scores and history.
-        if not self.players:
+        # The pairing runs on a worker thread so the window stays responsive; _poll_pairing() shows the result.
+        if not self.tournament.players:
             messagebox.showerror("Error", "Cannot generate pairings without any players.")
             return
-        if self.pairings_data:
+        if self.tournament.pairings_data:
             response = messagebox.askyesno("Confirm Regeneration",
-                                             "Pairings for the current round already exist. Generating new pairings will discard the old ones. Continue?")
+                                             "Pairings for the current round already exist. They will be recomputed: brackets that haven't changed keep the same boards, but any results entered for this round will be cleared. Continue?")
             if not response:
                 return
 
         self._clear_and_rebuild_tournament_ui()
-        self.pairings_data = {} # Clear previous round's pairings data
-
-        ms_players = [p for p in self.players if p.school == "Middle School"]
-        hs_players = [p for p in self.players if p.school == "High School"]
-
-        # Pairing and color assignment are distinct steps
-        ms_raw_pairings, ms_bye, ms_active_in_bracket = self._run_pairing_algorithm(ms_players)
-        hs_raw_pairings, hs_bye, hs_active_in_bracket = self._run_pairing_algorithm(hs_players)
-
-        ms_colored_pairings = self._assign_colors_to_pairings(ms_raw_pairings)
-        hs_colored_pairings = self._assign_colors_to_pairings(hs_raw_pairings)
-
-        # Save the colored pairings (by player name) for persistence
-        self.pairings_data['Middle School'] = {
-            'pairings': [(w.name, b.name) for w, b in ms_colored_pairings],
-            'bye': ms_bye.name if ms_bye else None,
-            'active': [p.name for p in ms_active_in_bracket]
-        }
-        self.pairings_data['High School'] = {
-            'pairings': [(w.name, b.name) for w, b in hs_colored_pairings],
-            'bye': hs_bye.name if hs_bye else None,
-            'active': [p.name for p in hs_active_in_bracket]
-        }
+        self.pairing_task = self.tournament.start_pairings(mode=self.pairing_mode_var.get())
+        threading.Thread(target=self.pairing_task.run, name="Pairing", daemon=True).start()
+        if self.pairing_task.total > 1:
+            self.pairing_progress.configure(mode="determinate")
+            self.pairing_progress.set(0)
+        else: # Nothing to count for a single bracket, so just show that it's busy
+            self.pairing_progress.configure(mode="indeterminate")
+            self.pairing_progress.start()
+        self.pairing_progress_frame.pack(side="left", padx=20)
+        self.update_tournament_button_states()
+        self.after(PAIRING_POLL_MS, self._poll_pairing)
+
+    def _poll_pairing(self):
+        # Runs on the main loop while pairing: updates the progress bar, and once the worker
+        # thread is done, applies and shows the pairings. Tk is only ever touched from here.
+        task = self.pairing_task
+        if task is None:
+            return # Stopped by _stop_pairing()
+        if not task.finished:
+            if task.total > 1:
+                self.pairing_progress.set(task.done / task.total)
+            self.after(PAIRING_POLL_MS, self._poll_pairing)
+            return
+        self._stop_pairing()
+        try:
+            bracket_pairings = self.tournament.finish_pairings(task)
+        except engine.PairingCancelled:
+            self.rebuild_ui_from_saved_state() # Show the pairings from before, if there were any
+            return
+        except Exception as e:
+            messagebox.showerror("Pairing Error", f"Failed to generate pairings.\nError: {e}")
+            self.rebuild_ui_from_saved_state()
+            return
+        self._record_change('pairings', current_round=self.tournament.current_round, pairings_data=self.tournament.pairings_data,
+                            seed=self.tournament.pairing_seed())
 
-        self._display_and_create_results_ui("Middle School", ms_colored_pairings, ms_bye, self.ms_results_textbox, self.ms_results_frame)
-        self._display_and_create_results_ui("High School", hs_colored_pairings, hs_bye, self.hs_results_textbox, self.hs_results_frame)
+        for bracket, (colored_pairings, bye_player) in bracket_pairings.items():
+            self._display_and_create_results_ui(bracket, colored_pairings, bye_player)
         self.unsaved_changes = True
         self.update_tournament_button_states()
+        warnings = self.tournament.pairing_warnings()
+        if warnings:
+            messagebox.showwarning("Pairing Rules", "\n\n".join(warnings))
+
+    def cancel_pairing(self):
+        # Asks the pairing thread to stop; _poll_pairing() tidies up once it has.
+        if self.pairing_task:
+            self.pairing_task.cancel()
+
+    def _stop_pairing(self):
+        # Forgets the running pairing (cancelling it if it's still going) and hides its progress bar.
+        if self.pairing_task and not self.pairing_task.finished:
+            self.pairing_task.cancel()
+        self.pairing_task = None
+        self.pairing_progress.stop()
+        self.pairing_progress_frame.pack_forget()
+        self.update_tournament_button_states()
 
     def rebuild_ui_from_saved_state(self):
         # Rebuilds the tournament UI based on loaded pairings data.
-        if not self.pairings_data:
+        if not self.tournament.pairings_data:
             self.update_tournament_button_states()
             return
         self._clear_and_rebuild_tournament_ui()
-        player_map = {p.name: p for p in self.players}
-        for bracket in ["Middle School", "High School"]:
-            if bracket in self.pairings_data and self.pairings_data[bracket]:
-                data = self.pairings_data[bracket]
+        for bracket in self.tournament.bracket_names():
+            if bracket in self.tournament.pairings_data and self.tournament.pairings_data[bracket]:
                 # Reconstruct colored pairings from saved data using player objects
-                colored_pairings = []
-                for w_name, b_name in data['pairings']:
-                    white_player = player_map.get(w_name)
-                    black_player = player_map.get(b_name)
-                    if white_player and black_player:
-                        colored_pairings.append((white_player, black_player))
-                    else:
-                        print(f"Warning: Player not found during UI rebuild for pairing {w_name} vs {b_name}")
-
-                bye_player = player_map.get(data['bye']) if data['bye'] else None
-                textbox = self.ms_results_textbox if bracket == "Middle School" else self.hs_results_textbox
-                scroll_frame = self.ms_results_frame if bracket == "Middle School" else self.hs_results_frame
-                self._display_and_create_results_ui(bracket, colored_pairings, bye_player, textbox, scroll_frame)
+                colored_pairings, bye_player = self.tournament.bracket_pairings(bracket)
+                self._display_and_create_results_ui(bracket, colored_pairings, bye_player)
         self.update_tournament_button_states()
 
-    def _assign_colors_to_pairings(self, pairings):
-        # Assigns colors (White/Black) to players in each pairing based on color history.
-        colored_pairings = []
-        for p1, p2 in pairings:
-            p1_whites = p1.color_history.count('W')
-            p1_blacks = p1.color_history.count('B')
-            p2_whites = p2.color_history.count('W')
-            p2_blacks = p2.color_history.count('B')
-
-            # Player with more past White games (stronger pull to Black) gets Black
-            if (p1_whites - p1_blacks) > (p2_whites - p2_blacks):
-                white_player, black_player = p2, p1
-            elif (p2_whites - p2_blacks) > (p1_whites - p1_blacks):
-                white_player, black_player = p1, p2
-            else:
-                # If equal color balance, randomize
-                white_player, black_player = random.sample([p1, p2], 2)
-            colored_pairings.append((white_player, black_player))
-        return colored_pairings
-
-    def _display_and_create_results_ui(self, bracket_name, colored_pairings, bye_player, textbox, scroll_frame):
-        # Displays standings and pairings, and creates UI widgets for result entry.
+    def _display_and_create_results_ui(self, bracket_name, colored_pairings, bye_player):
+        # Displays standings and pairings, and fills the bracket's result list with its boards.
+        textbox = self.bracket_textboxes[bracket_name]
         textbox.configure(state="normal")
         textbox.delete("1.0", "end")
 
-        # Display Standings
-        standings_text = f"--- {bracket_name} Standings (Before Round {self.current_round}) ---\n"
-        # Only include players who joined by the current round for standings display
-        bracket_players = sorted([p for p in self.players if p.school == bracket_name and p.round_joined <= self.current_round],
-                                 key=lambda p: p.score, reverse=True)
-        for p in bracket_players:
-            status = " (Inactive)" if not p.is_active else ""
-            standings_text += f"{p.name:<25} {p.score:>5.1f} pts{status}\n"
-        textbox.insert("end", standings_text + "\n")
-
-        # Display Pairings
-        pairings_text = f"--- {bracket_name} Pairings for Round {self.current_round} ---\n"
-        pairings_text += f"{'Board':<7} {'White':<25} {'Black':<25}\n"
-        pairings_text += "-" * 60 + "\n"
-
-        self.result_widgets[bracket_name] = []
-
-        for i, (white_player, black_player) in enumerate(colored_pairings):
-            pairings_text += f"{i+1:<7} {white_player.name:<25} {black_player.name:<25}\n"
-
-        if bye_player: pairings_text += f"\nBYE: {bye_player.name}\n"
-
-        inactive_players_in_bracket = [p for p in bracket_players if not p.is_active]
-        if inactive_players_in_bracket:
-            pairings_text += "\n--- Inactive Players (Auto Absent Bye) ---\n"
-            for p in inactive_players_in_bracket: pairings_text += f"- {p.name}\n"
-
-        textbox.insert("end", pairings_text)
+        # Display Standings and Pairings
+        textbox.insert("end", engine.format_bracket_report(bracket_name, self.tournament.players, self.tournament.current_round, colored_pairings, bye_player, self.tournament.standings))
         textbox.configure(state="disabled")
 
-        # Clear previous result input widgets
-        for widget in scroll_frame.winfo_children():
-            widget.destroy()
-
-        # Create result input widgets for each pairing
-        for i, (white_player, black_player) in enumerate(colored_pairings):
-            pair_frame = ctk.CTkFrame(scroll_frame)
-            pair_frame.pack(fill="x", padx=5, pady=4)
-            result_var = tk.StringVar(value="TBD")
-            absent_p1_var = tk.BooleanVar(); absent_p2_var = tk.BooleanVar()
-
+        pending_results = self.tournament.pending_results.get(bracket_name, {})
+        boards = []
+        for white_player, black_player in colored_pairings:
             # Pre-check absent if player is inactive
-            if not white_player.is_active:
-                absent_p1_var.set(True)
-            if not black_player.is_active:
-                absent_p2_var.set(True)
-
-            ctk.CTkLabel(pair_frame, text=f"B{i+1}:", font=ctk.CTkFont(weight="bold")).pack(side="left", padx=(5, 10))
-            w_win = ctk.CTkRadioButton(pair_frame, text=f"{white_player.name} (W)", variable=result_var, value=f"{white_player.name}_win")
-            w_absent = ctk.CTkCheckBox(pair_frame, text="Absent", variable=absent_p1_var, width=1)
-            draw_btn = ctk.CTkRadioButton(pair_frame, text="Draw", variable=result_var, value="draw")
-            b_win = ctk.CTkRadioButton(pair_frame, text=f"{black_player.name} (B)", variable=result_var, value=f"{black_player.name}_win")
-            b_absent = ctk.CTkCheckBox(pair_frame, text="Absent", variable=absent_p2_var, width=1)
-
-            w_win.pack(side="left", padx=5, expand=True, fill='x'); w_absent.pack(side="left", padx=(0,15)); draw_btn.pack(side="left", padx=5)
-            b_win.pack(side="left", padx=15, expand=True, fill='x'); b_absent.pack(side="left", padx=(0,5))
-
-            widget_dict = {
+            board = {
                 'white': white_player,
                 'black': black_player,
-                'result_var': result_var,
-                'absent_white_var': absent_p1_var,
-                'absent_black_var': absent_p2_var,
-                'widgets': {'w_win': w_win, 'draw': draw_btn, 'b_win': b_win}
+                'result': None,
+                'absent_white': not white_player.is_active,
+                'absent_black': not black_player.is_active
             }
-            # Configure commands for checkboxes to handle disabling radio buttons
-            w_absent.configure(command=lambda d=widget_dict: self._on_absence_toggle(d))
-            b_absent.configure(command=lambda d=widget_dict: self._on_absence_toggle(d))
-
-            # Apply initial state for inactive players
-            if not white_player.is_active:
-                w_absent.select()
-                self._on_absence_toggle(widget_dict)
-            if not black_player.is_active:
-                b_absent.select()
-                self._on_absence_toggle(widget_dict)
-
-            self.result_widgets[bracket_name].append(widget_dict)
-
-    def _run_pairing_algorithm(self, players_in_bracket):
-        # Implements the Swiss-style pairing algorithm for a given bracket.
-        # Filter for active players who joined by the current round
-        initial_active_players = [p for p in players_in_bracket if p.is_active and p.round_joined <= self.current_round]
-
-        if len(initial_active_players) < 2:
-            return [], initial_active_players[0] if initial_active_players else None, initial_active_players
-
-        players_pool_for_pairing = list(initial_active_players)
-
-        # Step 1: Determine Bye Player (if odd number of players)
-        bye_player = None
-        # Prioritize players who haven't had a bye, then lowest score, then alphabetically
-        players_for_bye_consideration = sorted(players_pool_for_pairing, key=lambda p: (p.had_pairing_bye, p.score, p.name))
-
-        if len(players_for_bye_consideration) % 2 != 0:
-            for p in players_for_bye_consideration:
-                if not p.had_pairing_bye:
-                    bye_player = p
-                    break
-            if not bye_player: # If everyone has had a bye, pick the one with the lowest score
-                bye_player = players_for_bye_consideration[0]
-
-            players_pool_for_pairing.remove(bye_player)
-
-        # Step 2: Sort remaining active players by score (descending)
-        players_to_pair = sorted(players_pool_for_pairing, key=lambda p: p.score, reverse=True)
-
-        pairings = []
-        unpaired_pool = set(players_to_pair)
-
-        while len(unpaired_pool) >= 2:
-            # Select the highest-scoring unpaired player (or random from highest score group)
-            max_score = max(p.score for p in unpaired_pool)
-            highest_score_players = [p for p in unpaired_pool if p.score == max_score]
-            p1 = random.choice(highest_score_players)
-
-            unpaired_pool.remove(p1)
-
-            best_p2 = None
-            # Criteria for best opponent: (played_before, score_diff, num_times_played) - lower is better
-            best_criteria = (True, float('inf'), float('inf'))
-
-            candidates = list(unpaired_pool)
-            random.shuffle(candidates) # Randomize candidates to break ties naturally
-
-            for p2 in candidates:
-                played_before = p2.name in p1.opponent_history
-                score_diff = abs(p1.score - p2.score)
-                num_times_played = p1.opponent_history.count(p2.name) if played_before else 0
-
-                current_criteria = (played_before, score_diff, num_times_played)
-
-                if current_criteria < best_criteria:
-                    best_criteria = current_criteria
-                    best_p2 = p2
-
-            if best_p2:
-                pairings.append((p1, best_p2))
-                unpaired_pool.remove(best_p2)
-            else:
-                unpaired_pool.add(p1) # Add p1 back if no match found (WON'T HAPPEN THOUGH, I think)
-                break
-
-        return pairings, bye_player, initial_active_players
-
-    def _on_absence_toggle(self, result_data):
-        # Handles the logic when an 'Absent' checkbox is toggled, disabling/enabling result radio buttons.
-        is_white_absent = result_data['absent_white_var'].get()
-        is_black_absent = result_data['absent_black_var'].get()
-
-        for widget in result_data['widgets'].values():
-            if is_white_absent or is_black_absent:
-                widget.configure(state="disabled")
-            else:
-                widget.configure(state="normal")
+            # Restore a result that was entered before the program was closed
+            pending = pending_results.get(white_player.name)
+            if pending and pending['black'] == black_player.name:
+                board['absent_white'] = pending['absent_white']
+                board['absent_black'] = pending['absent_black']
+                if pending['result'] and not (board['absent_white'] or board['absent_black']):
+                    board['result'] = pending['result']
+            boards.append(board)
+        self.result_boards[bracket_name] = boards
+        self.bracket_result_lists[bracket_name].set_items(boards)
+
+    def _result_entry(self, board):
+        # Returns the name-based result entry for one board.
+        return {
+            'white': board['white'].name,
+            'black': board['black'].name,
+            'result': board['result'],
+            'absent_white': board['absent_white'],
+            'absent_black': board['absent_black']
+        }
 
-        if is_white_absent or is_black_absent:
-            result_data['result_var'].set("TBD") # Reset result if someone is marked absent
+    def _on_result_entered(self, bracket_name, board):
+        # Remembers a board's result as soon as it is entered.
+        entry = self._result_entry(board)
+        self.tournament.set_pending_result(bracket_name, entry)
+        self._record_change('board_result', bracket=bracket_name, entry=entry)
 
     def submit_results(self):
         # Processes and applies the results entered for the current round, updates player scores and histories.
-        if not self.result_widgets:
+        if not self.result_boards:
             messagebox.showerror("Error", "No pairings have been generated for this round.")
             return
 
         # Validate that all results have been entered (unless players are marked absent)
-        for bracket_name, results in self.result_widgets.items():
-            for i, res_data in enumerate(results):
-                absent_white = res_data['absent_white_var'].get()
-                absent_black = res_data['absent_black_var'].get()
-                result_pending = res_data['result_var'].get() == "TBD"
-
-                if not (absent_white or absent_black) and result_pending:
+        for bracket_name, boards in self.result_boards.items():
+            for i, board in enumerate(boards):
+                if not (board['absent_white'] or board['absent_black']) and not board['result']:
                     messagebox.showerror("Missing Result",
                                          f"Please enter a result for Board {i+1} in the {bracket_name} bracket, or mark a player as absent.")
                     return
 
-        # Reset had_pairing_bye for all players for the next round's calculation
-        for p in self.players:
-            p.had_pairing_bye = False
-
-        # Process results for paired players
-        for bracket_name, results in self.result_widgets.items():
-            for res_data in results:
-                white_p, black_p = res_data['white'], res_data['black']
-                absent_white = res_data['absent_white_var'].get()
-                absent_black = res_data['absent_black_var'].get()
-
-                # Handle cases where one or both players are absent
-                if absent_white or absent_black:
-                    if absent_white:
-                        if white_p.absent_count < 3: white_p.score += 0.5
-                        white_p.absent_count += 1
-                        white_p.opponent_history.append("Absent" if white_p.is_active else "Inactive Bye")
-                        white_p.color_history.append("N/A")
-                    if absent_black:
-                        if black_p.absent_count < 3: black_p.score += 0.5
-                        black_p.absent_count += 1
-                        black_p.opponent_history.append("Absent" if black_p.is_active else "Inactive Bye")
-                        black_p.color_history.append("N/A")
-
-                    # Award full point to the present player if opponent is absent
-                    if absent_white and not absent_black:
-                        black_p.score += 1.0
-                        black_p.opponent_history.append(f"{white_p.name} (Forfeit)")
-                        black_p.color_history.append("N/A")
-                    elif absent_black and not absent_white:
-                        white_p.score += 1.0
-                        white_p.opponent_history.append(f"{black_p.name} (Forfeit)")
-                        white_p.color_history.append("N/A")
-                    continue
-
-                # If both players were present, process the game result
-                result = res_data['result_var'].get()
-                if result == f"{white_p.name}_win":
-                    white_p.score += 1.0
-                elif result == f"{black_p.name}_win":
-                    black_p.score += 1.0
-                elif result == "draw":
-                    white_p.score += 0.5
-                    black_p.score += 0.5
-
-                # Update opponent and color history for present players
-                white_p.opponent_history.append(black_p.name)
-                white_p.color_history.append('W')
-                black_p.opponent_history.append(white_p.name)
-                black_p.color_history.append('B')
-
-        # Handle assigned pairing byes
-        for bracket, data in self.pairings_data.items():
-            bye_name = data.get('bye')
-            if bye_name:
-                bye_p = next((p for p in self.players if p.name == bye_name), None)
-                if bye_p and bye_p.is_active: # Only active players get points for pairing bye
-                    bye_p.score += 1.0
-                    bye_p.had_pairing_bye = True
-                    bye_p.opponent_history.append("Pairing Bye")
-                    bye_p.color_history.append("N/A")
-
-        # Handle inactive players who were not part of any pairing
-        all_paired_players_in_round = set()
-        for b_data in self.result_widgets.values():
-            for r_data in b_data:
-                all_paired_players_in_round.add(r_data['white'])
-                all_paired_players_in_round.add(r_data['black'])
-
-        for bracket_data in self.pairings_data.values():
-            bye_name = bracket_data.get('bye')
-            if bye_name:
-                bye_p = next((p for p in self.players if p.name == bye_name), None)
-                if bye_p and bye_p.is_active:
-                    all_paired_players_in_round.add(bye_p)
-
-        for p in self.players:
-            # If a player is inactive and wasn't explicitly part of a pairing or a pairing bye
-            if not p.is_active and p not in all_paired_players_in_round:
-                if p.absent_count < 3: p.score += 0.5
-                p.absent_count += 1
-                p.opponent_history.append("Inactive Bye")
-                p.color_history.append("N/A")
-
-        self.current_round += 1
-        self.round_label.configure(text=f"Current Round: {self.current_round}")
-        self.pairings_data = {} # Clear pairings after results are submitted
+        entries = [self._result_entry(board) for boards in self.result_boards.values() for board in boards]
+        self.tournament.submit_results(self.tournament.make_boards(entries))
+        self._record_change('submit_round', entries=entries)
+
+        self.round_label.configure(text=f"Current Round: {self.tournament.current_round}")
         self._clear_and_rebuild_tournament_ui()
         self.update_player_list_frame()
-        messagebox.showinfo("Success", f"Round {self.current_round - 1} finalized. Ready for Round {self.current_round}.")
+        messagebox.showinfo("Success", f"Round {self.tournament.current_round - 1} finalized. Ready for Round {self.tournament.current_round}.")
         self.unsaved_changes = True
         self.update_tournament_button_states()
 
     def update_tournament_button_states(self):
         # Updates the enabled/disabled state of tournament control buttons based on current state.
+        if not self.tournament_tab_built:
+            return
         # Check if there are enough active players to generate pairings in any bracket
         has_enough_active_players = False
-        ms_active = [p for p in self.players if p.school == "Middle School" and p.is_active and p.round_joined <= self.current_round]
-        hs_active = [p for p in self.players if p.school == "High School" and p.is_active and p.round_joined <= self.current_round]
-        if len(ms_active) >= 2 or len(hs_active) >= 2:
-            has_enough_active_players = True
+        for bracket in self.tournament.bracket_names():
+            bracket_active = engine.active_players_for_round(self.tournament.index.active_players(bracket), self.tournament.current_round)
+            if len(bracket_active) >= 2:
+                has_enough_active_players = True
+                break
 
+        if self.pairing_task: # Only the pairing's Cancel button works until it's done
+            self.generate_pairings_button.configure(state="disabled")
+            self.submit_results_button.configure(state="disabled")
         # If pairings are currently displayed, enable both buttons
-        if self.result_widgets and any(self.result_widgets.values()):
+        elif self.result_boards and any(self.result_boards.values()):
             self.generate_pairings_button.configure(state="normal")
             self.submit_results_button.configure(state="normal")
         else: # No pairings currently displayed
             self.generate_pairings_button.configure(state="normal" if has_enough_active_players else "disabled")
             self.submit_results_button.configure(state="disabled")
+        self.update_undo_buttons()
 
     def on_closing(self):
         # Handles the application closing event, prompting to save unsaved changes.
@@ -725,13 +782,16 @@ class TournamentApp(ctk.CTk):
                                                  "You have unsaved changes. Do you want to save before quitting?")
             if response is True: # Yes, save
                 if self.export_data(): # If save was successful
-                    self.destroy()
+                    self._close()
             elif response is False: # No, don't save
-                self.destroy()
+                if self.journal: self.journal.discard()
+                self._close()
             # If response is None (Cancel), do nothing
         else:
-            self.destroy()
+            self._close()
 
 if __name__ == "__main__":
+    import multiprocessing
+    multiprocessing.freeze_support() # Needed for parallel pairing in the packaged .exe
     app = TournamentApp()
     app.mainloop()
@@ -0,0 +1,197 @@
+"""
+Benchmarks for pairing and scoring.
+
+Generates synthetic tournaments and plays them out round by round with the engine, timing
+pairing (including color assignment) and result submission, and measuring pairing quality:
+
+    python bench.py                                   # 100 and 500 players, both pairing modes
+    python bench.py --players 1000 --rounds 7 --mode optimal
+    python bench.py --players 200 --absence-rate 0.1 --draw-rate 0.3 --json > run.json
+
+Each player gets a hidden strength, and the stronger player usually wins, so scores spread
+out the way they do in a real event. Players are rated by their strength, and the rank
+correlation shows how closely the final scores follow it (1.0 = perfectly), i.e. how well
+the rounds played sorted the field. The same --seed always plays out the same tournament.
+"""
+
+import argparse
+import json
+import math
+import random
+import sys
+import time
+import tracemalloc
+
+import engine
+from engine import Player
+
+RATING_MEAN = 1500
+RATING_SPREAD = 300 # Rating points per unit of hidden strength
+
+def make_tournament(num_players, brackets, rng):
+    # Creates a round-1 tournament with players spread evenly over the brackets, rated by
+    # their hidden strength. Returns (tournament, {name: strength}).
+    players = [Player(f"Player {i+1}", brackets[i % len(brackets)]) for i in range(num_players)]
+    strengths = {p.name: rng.gauss(0, 1) for p in players}
+    for p in players:
+        p.rating = round(RATING_MEAN + RATING_SPREAD * strengths[p.name])
+    return engine.Tournament(players, brackets=list(brackets), seed=rng.getrandbits(engine.SEED_BITS)), strengths
+
+def update_statuses(tournament, inactive_rate, rng):
+    # Marks a random share of players inactive for the coming round; everyone else is active.
+    for p in tournament.players:
+        is_active = rng.random() >= inactive_rate
+        if is_active != p.is_active:
+            tournament.set_status(p, is_active)
+
+def play_board(white, black, strengths, draw_rate, absence_rate, rng):
+    # Returns the result entry for one board, decided by the players' strengths.
+    absent_white = rng.random() < absence_rate
+    absent_black = rng.random() < absence_rate
+    result = None
+    if not (absent_white or absent_black):
+        if rng.random() < draw_rate:
+            result = engine.DRAW
+        else:
+            white_expectation = 1 / (1 + math.exp(strengths[black.name] - strengths[white.name]))
+            result = engine.WHITE_WIN if rng.random() < white_expectation else engine.BLACK_WIN
+    return {'white': white.name, 'black': black.name, 'result': result,
+            'absent_white': absent_white, 'absent_black': absent_black}
+
+def ranks(values):
+    # Returns each value's rank (1 = smallest), with tied values sharing their average rank.
+    order = sorted(range(len(values)), key=values.__getitem__)
+    result = [0.0] * len(values)
+    start = 0
+    while start < len(order):
+        end = start
+        while end + 1 < len(order) and values[order[end + 1]] == values[order[start]]:
+            end += 1
+        for i in order[start:end + 1]:
+            result[i] = (start + end) / 2 + 1
+        start = end + 1
+    return result
+
+def rank_correlation(xs, ys):
+    # Spearman's rank correlation of two equally long lists (0.0 if either doesn't vary).
+    rx, ry = ranks(xs), ranks(ys)
+    mean = (len(xs) + 1) / 2
+    covariance = sum((a - mean) * (b - mean) for a, b in zip(rx, ry))
+    spread = math.sqrt(sum((a - mean) ** 2 for a in rx) * sum((b - mean) ** 2 for b in ry))
+    return covariance / spread if spread else 0.0
+
+def play_event(num_players, rounds, mode, seed, brackets, absence_rate, inactive_rate, draw_rate, workers):
+    # Plays a whole synthetic event.
+    # Returns (tournament, strengths, pair_times, submit_times, rematches, boards, score_gaps).
+    rng = random.Random(seed)
+    tournament, strengths = make_tournament(num_players, brackets, rng)
+    pair_times = []
+    submit_times = []
+    rematches = 0
+    boards_played = 0
+    score_gaps = []
+    for _ in range(rounds):
+        update_statuses(tournament, inactive_rate, rng)
+
+        start = time.perf_counter()
+        bracket_pairings = tournament.generate_pairings(mode=mode, workers=workers)
+        pair_times.append(time.perf_counter() - start)
+
+        entries = []
+        for colored_pairings, _ in bracket_pairings.values():
+            for white, black in colored_pairings:
+                if white.times_played(black.name):
+                    rematches += 1
+                score_gaps.append(abs(white.score - black.score))
+                entries.append(play_board(white, black, strengths, draw_rate, absence_rate, rng))
+        boards_played += len(entries)
+
+        start = time.perf_counter()
+        tournament.submit_results(tournament.make_boards(entries))
+        submit_times.append(time.perf_counter() - start)
+    return tournament, strengths, pair_times, submit_times, rematches, boards_played, score_gaps
+
+def run_event(num_players, rounds, mode, seed=0, brackets=engine.BRACKETS, absence_rate=0.0,
+              inactive_rate=0.0, draw_rate=0.1, workers=1, track_memory=True):
+    # Plays a synthetic event and returns its timings and quality metrics as a dictionary.
+    event = (num_players, rounds, mode, seed, brackets, absence_rate, inactive_rate, draw_rate, workers)
+    tournament, strengths, pair_times, submit_times, rematches, boards_played, score_gaps = play_event(*event)
+    peak_memory = None
+    if track_memory:
+        # Memory tracing slows Python down a lot, so it gets its own replay of the same event
+        tracemalloc.start()
+        play_event(*event)
+        peak_memory = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+
+    balances = [abs(p.color_balance()) for p in tournament.players]
+    return {
+        'players': num_players,
+        'rounds': rounds,
+        'mode': mode,
+        'seed': seed,
+        'brackets': len(brackets),
+        'absence_rate': absence_rate,
+        'inactive_rate': inactive_rate,
+        'draw_rate': draw_rate,
+        'pair_seconds': pair_times,
+        'submit_seconds': submit_times,
+        'max_pair_seconds': max(pair_times, default=0.0),
+        'total_seconds': sum(pair_times) + sum(submit_times),
+        'peak_memory_bytes': peak_memory,
+        'boards': boards_played,
+        'rematches': rematches,
+        'mean_color_imbalance': sum(balances) / len(balances) if balances else 0.0,
+        'max_color_imbalance': max(balances, default=0),
+        'mean_score_gap': sum(score_gaps) / len(score_gaps) if score_gaps else 0.0,
+        'max_score_gap': max(score_gaps, default=0.0),
+        'rank_correlation': rank_correlation([p.score for p in tournament.players], [strengths[p.name] for p in tournament.players]),
+    }
+
+def format_result(result):
+    # Returns a one-line human readable summary of a run_event() result.
+    memory = f"{result['peak_memory_bytes'] / 2**20:7.1f} MB" if result['peak_memory_bytes'] is not None else "      -   "
+    return (f"{result['mode']:>11} {result['players']:>6} players {result['rounds']:>3} rounds | "
+            f"pair max {result['max_pair_seconds']*1000:8.1f} ms | "
+            f"submit max {max(result['submit_seconds'], default=0.0)*1000:7.1f} ms | peak {memory} | "
+            f"rematches {result['rematches']:>4} | color imbalance {result['mean_color_imbalance']:.2f} (max {result['max_color_imbalance']}) | "
+            f"score gap {result['mean_score_gap']:.2f} (max {result['max_score_gap']}) | "
+            f"rank correlation {result['rank_correlation']:.3f}")
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="bench.py", description="Benchmark pairing and scoring on synthetic tournaments.")
+    parser.add_argument("--players", type=int, nargs="+", default=[100, 500], help="Roster sizes to run (default: 100 500)")
+    parser.add_argument("--rounds", type=int, default=7, help="Rounds per event (default: 7)")
+    parser.add_argument("--mode", choices=engine.PAIRING_MODES, nargs="+", default=list(engine.PAIRING_MODES), help="Pairing modes to compare (default: all)")
+    parser.add_argument("--brackets", type=int, default=len(engine.BRACKETS), help="Number of brackets to spread players over")
+    parser.add_argument("--absence-rate", type=float, default=0.05, help="Chance a paired player doesn't show up (default: 0.05)")
+    parser.add_argument("--inactive-rate", type=float, default=0.02, help="Chance a player sits a round out as inactive (default: 0.02)")
+    parser.add_argument("--draw-rate", type=float, default=0.1, help="Chance a played game is drawn (default: 0.1)")
+    parser.add_argument("--seed", type=int, default=0, help="Random seed for the synthetic events (default: 0)")
+    parser.add_argument("--workers", type=int, default=1, help="Worker processes for pairing brackets (default: 1)")
+    parser.add_argument("--no-memory", action="store_true", help="Skip the extra replay of each event that measures peak memory")
+    parser.add_argument("--json", action="store_true", help="Print the results as JSON instead of a table")
+    return parser
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    if args.brackets <= len(engine.BRACKETS):
+        brackets = engine.BRACKETS[:args.brackets]
+    else:
+        brackets = engine.BRACKETS + [f"Section {i+1}" for i in range(len(engine.BRACKETS), args.brackets)]
+    results = []
+    for num_players in args.players:
+        for mode in args.mode:
+            result = run_event(num_players, args.rounds, mode, seed=args.seed, brackets=brackets,
+                               absence_rate=args.absence_rate, inactive_rate=args.inactive_rate,
+                               draw_rate=args.draw_rate, workers=args.workers, track_memory=not args.no_memory)
+            results.append(result)
+            if not args.json:
+                print(format_result(result))
+    if args.json:
+        json.dump({'python': sys.version.split()[0], 'results': results}, sys.stdout, indent=2)
+        print()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
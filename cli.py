@@ -0,0 +1,164 @@
+"""
+Command-line mode for Chess Tournament Maker PT.
+
+Works on the same .json files the program imports and exports, without opening a window:
+
+    python cli.py pair tournament.json [--mode optimal]
+    python cli.py submit tournament.json results.json
+    python cli.py standings tournament.json
+    python cli.py register tournament.json signups.csv [--school "High School"]
+
+The results file maps each bracket to one result per board, in board order, e.g.
+    {"Middle School": ["1-0", "1/2", "0-1"], "High School": ["+-", "1-0"]}
+where "1-0" is a White win, "0-1" a Black win, "1/2" a draw, "+-" means Black was absent,
+"-+" means White was absent and "--" means both were absent.
+
+A registration file is a CSV file with one player per row; see registration.py for its columns.
+"""
+
+import argparse
+import json
+import sys
+
+import engine
+import registration
+import storage
+
+# Result notation accepted in results files -> (outcome, absent_white, absent_black)
+RESULT_CODES = {
+    "1-0": (engine.WHITE_WIN, False, False),
+    "0-1": (engine.BLACK_WIN, False, False),
+    "1/2": (engine.DRAW, False, False),
+    "1/2-1/2": (engine.DRAW, False, False),
+    "+-": (None, False, True),
+    "-+": (None, True, False),
+    "--": (None, True, True),
+    engine.WHITE_WIN: (engine.WHITE_WIN, False, False),
+    engine.BLACK_WIN: (engine.BLACK_WIN, False, False),
+    engine.DRAW: (engine.DRAW, False, False),
+}
+
+class CLIError(Exception):
+    # An error that should be reported to the user without a traceback.
+    pass
+
+def load_tournament(path):
+    # Loads the snapshot plus any changes still in its journal log.
+    tournament, _, _ = storage.load(path)
+    return tournament
+
+def save_tournament(tournament, path):
+    storage.save(path, tournament)
+
+def build_round(tournament, results):
+    # Matches a results file against the saved pairings and returns the round as arrays for
+    # Tournament.apply_round(): (White players, Black players, outcome codes, absence bits).
+    whites, blacks = [], []
+    outcomes, absences = bytearray(), bytearray()
+    for bracket, data in tournament.pairings_data.items():
+        if not data or not data['pairings']:
+            continue
+        bracket_results = results.get(bracket)
+        if bracket_results is None:
+            raise CLIError(f"No results given for the {bracket} bracket.")
+        colored_pairings, _ = tournament.bracket_pairings(bracket)
+        if len(colored_pairings) != len(data['pairings']):
+            raise CLIError(f"Some players in the {bracket} pairings are no longer on the roster.")
+        if len(bracket_results) != len(colored_pairings):
+            raise CLIError(f"The {bracket} bracket has {len(colored_pairings)} boards but {len(bracket_results)} results were given.")
+        for i, ((white_player, black_player), code) in enumerate(zip(colored_pairings, bracket_results)):
+            if not isinstance(code, str) or code not in RESULT_CODES:
+                raise CLIError(f"Unknown result '{code}' for Board {i+1} in the {bracket} bracket.")
+            outcome, absent_white, absent_black = RESULT_CODES[code]
+            whites.append(white_player)
+            blacks.append(black_player)
+            outcomes.append(engine.OUTCOME_CODES.get(outcome, engine.NO_RESULT))
+            absences.append((engine.ABSENT_WHITE if absent_white else 0) | (engine.ABSENT_BLACK if absent_black else 0))
+    return whites, blacks, outcomes, absences
+
+def cmd_pair(args):
+    tournament = load_tournament(args.file)
+    if tournament.pairings_data and not args.force:
+        raise CLIError("Pairings for the current round already exist. Use --force to pair the round again (unchanged brackets keep the same boards; results entered for it are cleared).")
+    tournament.generate_pairings(mode=args.mode, seed=args.seed, workers=args.workers)
+    save_tournament(tournament, args.output or args.file)
+    print(tournament.report())
+    print(f"Paired with seed {tournament.pairing_seed()}.")
+    for warning in tournament.pairing_warnings():
+        print(f"Warning: {warning}", file=sys.stderr)
+
+def cmd_submit(args):
+    tournament = load_tournament(args.file)
+    if not tournament.pairings_data:
+        raise CLIError("No pairings have been generated for this round.")
+    if args.results == "-":
+        results = json.load(sys.stdin)
+    else:
+        with open(args.results, 'r') as f: results = json.load(f)
+    if not isinstance(results, dict) or not all(isinstance(codes, list) for codes in results.values()):
+        raise CLIError('The results file must give a list of results for each bracket, e.g. {"High School": ["1-0", "1/2"]}.')
+    tournament.apply_round(*build_round(tournament, results))
+    save_tournament(tournament, args.output or args.file)
+    print(f"Round {tournament.current_round - 1} finalized. Ready for Round {tournament.current_round}.")
+
+def cmd_register(args):
+    tournament = load_tournament(args.file)
+    with registration.open_csv(args.players) as f:
+        roster_import = registration.RosterImport(tournament, f, default_school=args.school)
+        roster_import.read_all()
+    roster_import.commit()
+    if roster_import.players:
+        save_tournament(tournament, args.output or args.file)
+    print(roster_import.summary())
+
+def cmd_standings(args):
+    tournament = load_tournament(args.file)
+    brackets = tournament.bracket_names()
+    if args.bracket and args.bracket not in brackets:
+        raise CLIError(f"There is no '{args.bracket}' bracket. Brackets: {', '.join(brackets)}")
+    for bracket in [args.bracket] if args.bracket else brackets:
+        print(engine.format_standings(bracket, tournament.players, tournament.current_round, tournament.standings))
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="cli.py", description="Run tournament rounds from the command line.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    pair = subparsers.add_parser("pair", help="Generate pairings for the current round.")
+    pair.add_argument("file", help="Tournament .json file")
+    pair.add_argument("--mode", choices=engine.PAIRING_MODES, default=engine.GREEDY, help="Pairing method (default: greedy)")
+    pair.add_argument("--seed", type=int, help="Random seed for this round (default: derived from the tournament's own seed)")
+    pair.add_argument("--workers", type=int, help="Most worker processes to pair brackets with (default: one per CPU, for big rounds only; 1 = no parallelism)")
+    pair.add_argument("--force", action="store_true", help="Replace pairings that already exist")
+    pair.add_argument("-o", "--output", help="Write the updated tournament here instead of overwriting the file")
+    pair.set_defaults(func=cmd_pair)
+
+    submit = subparsers.add_parser("submit", help="Apply the current round's results and move to the next round.")
+    submit.add_argument("file", help="Tournament .json file")
+    submit.add_argument("results", help="Results .json file, or - to read from standard input")
+    submit.add_argument("-o", "--output", help="Write the updated tournament here instead of overwriting the file")
+    submit.set_defaults(func=cmd_submit)
+
+    register = subparsers.add_parser("register", help="Add the players listed in a CSV file.")
+    register.add_argument("file", help="Tournament .json file")
+    register.add_argument("players", help="CSV file with one player per row")
+    register.add_argument("--school", help="School or section for rows that don't give one")
+    register.add_argument("-o", "--output", help="Write the updated tournament here instead of overwriting the file")
+    register.set_defaults(func=cmd_register)
+
+    standings = subparsers.add_parser("standings", help="Print the current standings.")
+    standings.add_argument("file", help="Tournament .json file")
+    standings.add_argument("--bracket", help="Only show one bracket")
+    standings.set_defaults(func=cmd_standings)
+    return parser
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    try:
+        args.func(args)
+    except (CLIError, OSError, ValueError, KeyError) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,266 @@
+"""
+Hard pairing constraints.
+
+Rematches are only avoided when possible, but these rules are never broken if there is any
+way to pair the bracket without breaking them:
+
+* Team: players from the same team (a club, a family, ...) aren't paired together.
+* Colors: nobody gets the same color more than MAX_COLOR_STREAK times in a row, so two
+  players who both need the same color this round can't be paired together.
+
+A PairingConstraints object works these out once per round for a bracket's active players
+and keeps them as bitsets: one int per player with a bit set for every player they may not
+meet (their own bit may be set too). Players kept apart by the same rule alone share one
+int, so even a rule covering most of a big bracket costs little to set up. Checking a pair
+is a shift and an and, and the backtracking search in repair() can see at once when a player
+has nobody left to play and give up on that branch.
+
+The bye goes to a player whose absence leaves no group kept apart by a rule holding more than
+half of the bracket, if there is one, since such a group can't all meet players outside it.
+If a bracket can't be paired under every rule (e.g. most of it is one team), the rules are
+relaxed one at a time, in RULES order: a relaxed rule may be broken, but opponents are then
+swapped between boards so that as few boards as possible break it.
+"""
+
+TEAM = "team"
+COLORS = "colors"
+RULES = (COLORS, TEAM) # In the order they are relaxed when a bracket can't be paired otherwise
+RULE_DESCRIPTIONS = {TEAM: "players from the same team kept apart", COLORS: "the same color at most twice in a row"}
+
+MAX_COLOR_STREAK = 2
+BACKTRACK_MAX_PLAYERS = 64 # Most players re-paired at once by repair()'s backtracking search
+BACKTRACK_NODE_LIMIT = 20000 # Partial pairings the search tries before giving up
+RELAXED_SWAP_WINDOW = 16 # Boards on either side of one breaking a relaxed rule that it may swap opponents with
+
+def color_needed(player):
+    # Returns the color the player must get this round ('W' or 'B'), or None if either will do.
+    if player.color_streak() >= MAX_COLOR_STREAK:
+        return 'B' if player.last_color() == 'W' else 'W'
+    return None
+
+def _bits(mask):
+    # Yields the positions of the set bits in 'mask', lowest first.
+    while mask:
+        low = mask & -mask
+        yield low.bit_length() - 1
+        mask ^= low
+
+def _mask(positions, size):
+    # Returns a bitset with the given positions set. Built as bytes, since adding bits to a
+    # big int one at a time copies it every time.
+    bits = bytearray((size + 7) // 8)
+    for i in positions:
+        bits[i >> 3] |= 1 << (i & 7)
+    return int.from_bytes(bits, 'little')
+
+class PairingConstraints:
+    # The rules for pairing one bracket's active players this round. Pass the players a
+    # pairing method works on; allows() then says whether two of them may be paired.
+    # 'relaxed_rules' may be broken, but repair() keeps the boards breaking them to a minimum.
+    def __init__(self, players, rules=RULES, relaxed_rules=()):
+        self.players = list(players)
+        self.rules = tuple(rules)
+        self.relaxed_rules = tuple(relaxed_rules)
+        self.position = {p: i for i, p in enumerate(self.players)}
+        self.forbidden = [0] * len(self.players) # Bitsets of the players each one may not meet
+        self.discouraged = [0] * len(self.players) # Bitsets of the players each one may only meet under a relaxed rule
+        self.in_effect = set() # The rules (not relaxed) that keep at least two of these players apart
+        self._large_groups = [] # (rule, bitset, size) of groups kept apart holding about half the players or more
+
+        checked = self.rules + self.relaxed_rules
+        groups = {} # (rule, team or color) -> positions of the players it keeps apart
+        for i, p in enumerate(self.players):
+            if TEAM in checked and p.team:
+                groups.setdefault((TEAM, p.team.strip().casefold()), []).append(i)
+            needed = color_needed(p) if COLORS in checked else None
+            if needed:
+                groups.setdefault((COLORS, needed), []).append(i)
+        for (rule, _), members in groups.items():
+            if len(members) < 2:
+                continue
+            mask = _mask(members, len(self.players))
+            if 2 * len(members) >= len(self.players) - 1:
+                self._large_groups.append((rule, mask, len(members)))
+            if rule in self.rules:
+                self.in_effect.add(rule)
+                bitsets = self.forbidden
+            else:
+                bitsets = self.discouraged
+            for i in members:
+                bitsets[i] = bitsets[i] | mask if bitsets[i] else mask
+
+    def allows(self, p1, p2):
+        # Returns True if p1 and p2 may be paired (it may still be a rematch).
+        forbidden = self.forbidden[self.position[p1]]
+        return not forbidden or not forbidden >> self.position[p2] & 1 or p1 is p2
+
+    def broken(self, pairings, relaxed=False):
+        # Returns the positions of the boards in 'pairings' that break a rule (a relaxed rule
+        # if 'relaxed' is True).
+        if relaxed:
+            position = self.position
+            return [k for k, (p1, p2) in enumerate(pairings)
+                    if p1 is not p2 and self.discouraged[position[p1]] >> position[p2] & 1]
+        return [k for k, (p1, p2) in enumerate(pairings) if not self.allows(p1, p2)]
+
+    def relaxed(self):
+        # Returns (constraints with the first rule that keeps anyone apart relaxed, that rule).
+        rules = list(self.rules)
+        while rules[0] not in self.in_effect:
+            del rules[0]
+        rule = rules.pop(0)
+        return PairingConstraints(self.players, rules, self.relaxed_rules + (rule,)), rule
+
+    def forced_breaks(self, bye_player=None, relaxed=False):
+        # Returns how many boards must break a rule (a relaxed rule if 'relaxed' is True) if
+        # 'bye_player' gets the bye: players of a group kept apart by a rule beyond half of
+        # those left have to meet each other. It's a lower bound (players can be in a team and
+        # a color group at once), but any group making it above 0 rules out a legal pairing.
+        rules = self.relaxed_rules if relaxed else self.rules
+        remaining = len(self.players) - (bye_player is not None)
+        bit = 1 << self.position[bye_player] if bye_player is not None else 0
+        forced = 0
+        for rule, mask, size in self._large_groups:
+            if rule in rules:
+                size -= bool(mask & bit)
+                forced += max(0, 2 * size - remaining) // 2
+        return forced
+
+    def bye_candidates(self):
+        # Returns who may get the pairing bye, best first: players who haven't had one yet,
+        # those leaving a bracket that can be paired under the rules (or with the fewest
+        # relaxed rules broken), then lowest score first and by name. Only if everyone has had
+        # a bye can anyone get it.
+        eligible = [p for p in self.players if not p.had_pairing_bye] or self.players
+        if not self._large_groups:
+            return sorted(eligible, key=lambda p: (p.score, p.name))
+        return sorted(eligible, key=lambda p: (self.forced_breaks(p), self.forced_breaks(p, relaxed=True), p.score, p.name))
+
+    def repair(self, pairings):
+        # Returns the pairings with every broken board fixed, or None if that isn't possible.
+        # The players of the broken boards are re-paired by a backtracking search; while that
+        # fails, the boards nearest to them are added to the search as well, so as few boards
+        # as possible change. Boards that were fine keep their order. Then, if any rules are
+        # relaxed, as few boards as possible are left breaking them (see _fewer_relaxed_breaks).
+        pairings = self._repair(pairings)
+        if pairings is not None and any(self.discouraged):
+            pairings = self._fewer_relaxed_breaks(pairings)
+        return pairings
+
+    def _repair(self, pairings):
+        bad = self.broken(pairings)
+        if not bad:
+            return pairings
+        nearest = sorted((k for k in range(len(pairings)) if k not in set(bad)),
+                         key=lambda k: min(abs(k - b) for b in bad))
+        taken = list(bad)
+        while True:
+            players = [p for k in taken for p in pairings[k]]
+            repaired = self._search(players)
+            if repaired is not None:
+                taken = set(taken)
+                first = min(taken)
+                kept = [pair for k, pair in enumerate(pairings) if k not in taken]
+                insert_at = sum(1 for k in range(first) if k not in taken)
+                return kept[:insert_at] + repaired + kept[insert_at:]
+            if not nearest or len(players) >= BACKTRACK_MAX_PLAYERS:
+                return None
+            # Double the boards being re-paired each time, so hopeless cases give up quickly
+            more = min(len(taken), len(nearest), (BACKTRACK_MAX_PLAYERS - len(players) + 1) // 2)
+            taken.extend(nearest[:more])
+            del nearest[:more]
+
+    def _fewer_relaxed_breaks(self, pairings):
+        # Swaps opponents between two boards, (a, b) and (c, d) becoming (a, c) and (b, d),
+        # wherever that leaves fewer boards breaking a relaxed rule and none breaking the
+        # others, until no swap helps. A board breaking a relaxed rule tries the nearest
+        # RELAXED_SWAP_WINDOW boards on either side, then the other boards breaking one, and
+        # takes the first swap that makes no rematch (or else the first that helps at all).
+        players = self.players
+        pos = [(self.position[p1], self.position[p2]) for p1, p2 in pairings]
+        board_of = {}
+        for k, (i, j) in enumerate(pos):
+            board_of[i] = board_of[j] = k
+
+        def breaks(i, j):
+            return self.discouraged[i] >> j & 1
+
+        bad = {k for k, (i, j) in enumerate(pos) if breaks(i, j)}
+        bad_mask = _mask((i for k in bad for i in pos[k]), len(players))
+        improved = True
+        while improved and bad:
+            improved = False
+            for k in sorted(bad):
+                if k not in bad:
+                    continue
+                near = sorted(range(max(0, k - RELAXED_SWAP_WINDOW), min(len(pos), k + RELAXED_SWAP_WINDOW + 1)),
+                              key=lambda m: abs(m - k))
+                best = None
+                for a, b in (pos[k], pos[k][::-1]):
+                    # c must be someone a may meet under every rule, on another board
+                    allowed = ~self.discouraged[a] & ~self.forbidden[a] & ~(1 << a) & ~(1 << b)
+                    near_options = [c for m in near for c in pos[m] if allowed >> c & 1]
+                    for c in near_options + list(_bits(bad_mask & allowed)):
+                        m = board_of[c]
+                        d = pos[m][1] if pos[m][0] == c else pos[m][0]
+                        if self.forbidden[b] >> d & 1 or breaks(b, d) >= 1 + (m in bad):
+                            continue
+                        if not (players[a].times_played(players[c].name) or players[b].times_played(players[d].name)):
+                            best = (a, b, c, d, m)
+                            break
+                        best = best or (a, b, c, d, m)
+                    else:
+                        continue
+                    break
+                if best is None:
+                    continue
+                a, b, c, d, m = best
+                pos[k], pos[m] = (a, c), (b, d)
+                board_of[c], board_of[b] = k, m
+                bad.discard(k)
+                bad_mask &= ~((1 << a) | (1 << b))
+                if m in bad:
+                    bad.discard(m)
+                    bad_mask &= ~((1 << c) | (1 << d))
+                if breaks(b, d):
+                    bad.add(m)
+                    bad_mask |= (1 << b) | (1 << d)
+                improved = True
+        return [(players[i], players[j]) for i, j in pos]
+
+    def _search(self, players):
+        # Backtracking search for a pairing of 'players' that breaks no rule, preferring fresh
+        # opponents with the nearest score. Returns the pairs (highest score first) or None.
+        nodes = 0
+
+        def solve(remaining):
+            nonlocal nodes
+            if not remaining:
+                return []
+            nodes += 1
+            if nodes > BACKTRACK_NODE_LIMIT:
+                return None
+            # Pair the player with the fewest possible opponents first; if anyone has none
+            # left, this branch can't work
+            fewest = None
+            for i in _bits(remaining):
+                options = remaining & ~self.forbidden[i] & ~(1 << i)
+                count = bin(options).count("1") # int.bit_count() needs Python 3.10
+                if count == 0:
+                    return None
+                if fewest is None or count < fewest[0]:
+                    fewest = (count, i, options)
+            _, i, options = fewest
+            p1 = self.players[i]
+            opponents = sorted(_bits(options), key=lambda j: (p1.times_played(self.players[j].name),
+                                                               abs(p1.score - self.players[j].score), j))
+            for j in opponents:
+                rest = solve(remaining & ~(1 << i) & ~(1 << j))
+                if rest is not None:
+                    return [(p1, self.players[j])] + rest
+            return None
+
+        pairs = solve(sum(1 << self.position[p] for p in set(players)))
+        if pairs is not None:
+            pairs.sort(key=lambda pair: max(pair[0].score, pair[1].score), reverse=True)
+        return pairs
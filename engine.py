@@ -0,0 +1,1381 @@
+"""
+Headless pairing engine for Chess Tournament Maker PT.
+
+Everything in here works on plain Player objects and never touches customtkinter,
+so it can be imported by the GUI, by batch scripts, or on a machine without a display.
+"""
+
+import hashlib
+import itertools
+import os
+import random
+import threading
+from collections import OrderedDict, deque
+
+import constraints
+from constraints import PairingConstraints, color_needed
+from matching import max_weight_matching
+from standings import Standings, TIEBREAKS, TIEBREAK_LABELS
+
+BRACKETS = ["Middle School", "High School"] # Default brackets for a new tournament
+
+# Brackets are paired in separate processes only when a round has at least this many players
+# to pair in total; below that, starting the processes and copying the players to them takes
+# longer than pairing them here. Optimal pairing does far more work per player.
+PARALLEL_MIN_PLAYERS = 20000
+PARALLEL_MIN_OPTIMAL_PLAYERS = 2000
+
+PAIRING_CACHE_SIZE = 32 # Brackets' pairings kept by each tournament's PairingCache
+PAIRING_POOL_POLL_SECONDS = 0.1 # How often a pairing waiting on worker processes checks for cancellation
+
+# Outcome codes for a played game
+WHITE_WIN = "white_win"
+BLACK_WIN = "black_win"
+DRAW = "draw"
+OUTCOMES = (WHITE_WIN, BLACK_WIN, DRAW)
+
+# Pairing modes: the original greedy top-down search, a maximum-weight matching over the pool,
+# or rating order within score groups (optionally with accelerated first rounds)
+GREEDY = "greedy"
+OPTIMAL = "optimal"
+RATED = "rated"
+ACCELERATED = "accelerated"
+PAIRING_MODES = (GREEDY, OPTIMAL, RATED, ACCELERATED)
+
+# Edge penalties for optimal pairing (lower total penalty is better)
+REMATCH_PENALTY = 1000000 # Per previous game between the two players
+REMATCH_RECENCY_PENALTY = 100 # Times the history position of the last game, so recent rematches cost more
+SCORE_GAP_PENALTY = 100 # Multiplied by the squared score gap in half points
+COLOR_CLASH_PENALTY = 10 # Both players are due the same color
+CONSTRAINT_PENALTY = 100 * REMATCH_PENALTY # The game breaks a rule in constraints.py
+TIEBREAK_JITTER = 5 # Random noise so equally good pairings are chosen randomly
+GREEDY_SAMPLE_TRIES = 8 # Random picks from a score group before listing its fresh opponents
+BYE_CANDIDATES_TRIED = 3 # Players tried for the bye (of those who may get it) before a pairing rule is relaxed
+
+# Accelerated pairings: the top half of the bracket by rating is paired as if it had this many
+# extra points for the first rounds, so the strongest players meet each other sooner
+ACCELERATED_ROUNDS = 2
+ACCELERATION_POINTS = 1.0
+
+# Tournament and round seeds fit in 53 bits, so any JSON reader keeps them exact
+SEED_BITS = 53
+# Pools up to this size are paired over the complete graph; bigger pools only connect
+# each player to a window of neighbours in score order to keep the graph sparse
+FULL_GRAPH_LIMIT = 64
+MIN_NEIGHBOUR_WINDOW = 24
+MAX_SEGMENT_SIZE = 96 # Largest run of players solved as one matching (must be even)
+
+# Points and limits from the tournament rules
+WIN_POINTS = 1.0
+DRAW_POINTS = 0.5
+PAIRING_BYE_POINTS = 1.0
+ABSENT_BYE_POINTS = 0.5
+MAX_SCORED_ABSENCES = 3
+
+# Opponent history entries that are not games against another player
+NON_GAME_ENTRIES = ("Absent", "Inactive Bye", "Pairing Bye")
+ABSENCE_ENTRIES = ("Absent", "Inactive Bye") # The entries that count toward absent_count
+FORFEIT_SUFFIX = " (Forfeit)"
+
+# Compact result codes for applying a whole round at once (see apply_round_arrays)
+NO_RESULT = 0
+OUTCOME_CODES = {WHITE_WIN: 1, BLACK_WIN: 2, DRAW: 3}
+GAME_POINTS = (None, (WIN_POINTS, 0.0), (0.0, WIN_POINTS), (DRAW_POINTS, DRAW_POINTS)) # (White, Black) by code
+ABSENT_WHITE = 1 # Bits in a board's absence flags
+ABSENT_BLACK = 2
+
+UNDO_LIMIT = 100 # Most changes kept for undo (and redo)
+
+# Player.history_version values; never reused, so a version identifies one state of one player's history
+_history_versions = itertools.count(1)
+
+class Player:
+    # Represents a single player in the tournament.
+    # Slotted so big rosters don't pay for a __dict__ per player
+    __slots__ = ('name', 'school', 'is_active', 'score', 'opponent_history', 'color_history',
+                 'points_history', 'absent_count', 'had_pairing_bye', 'round_joined', 'player_id', 'rating', 'team',
+                 'history_version', '_opponents', '_whites', '_blacks', '_last_color', '_color_streak')
+
+    def __init__(self, name, school, is_active=True, score=0.0, opponent_history=None,
+                 color_history=None, absent_count=0, had_pairing_bye=False, round_joined=1,
+                 points_history=None, player_id=None, rating=None, team=None):
+        self.player_id = player_id # Stable ID, given by the tournament's RosterIndex
+        self.rating = rating # Optional rating (e.g. from a registration file), or None
+        self.team = team # Optional team, club or family; players on the same team aren't paired together
+        self.name = name
+        self.school = school
+        self.is_active = is_active
+        self.score = score
+        # Initialize lists to avoid mutable default argument issues
+        self.opponent_history = opponent_history if opponent_history is not None else []
+        self.color_history = color_history if color_history is not None else []
+        # Points earned in each round of opponent_history (None where an older save didn't record them)
+        self.points_history = points_history if points_history is not None else self._backfill_points()
+        self.absent_count = absent_count
+        self.had_pairing_bye = had_pairing_bye
+        self.round_joined = round_joined
+        self._rebuild_history_index()
+
+    def _backfill_points(self):
+        # Rebuilds the points history for players saved before it was recorded. Byes, absences
+        # and forfeits are worth fixed points, but the result of a played game is unknown.
+        points_history = []
+        absences = 0
+        for entry in self.opponent_history:
+            if entry == "Pairing Bye":
+                points_history.append(PAIRING_BYE_POINTS)
+            elif entry in NON_GAME_ENTRIES:
+                points_history.append(ABSENT_BYE_POINTS if absences < MAX_SCORED_ABSENCES else 0.0)
+                absences += 1
+            elif entry.endswith(FORFEIT_SUFFIX):
+                points_history.append(WIN_POINTS)
+            else:
+                points_history.append(None)
+        return points_history
+
+    def _rebuild_history_index(self):
+        # Rebuilds the opponent index and color counters from the saved histories.
+        # Real opponents are indexed as name -> [times played, history position of the last game].
+        self.history_version = next(_history_versions) # Changes whenever the histories do (see standings.py)
+        self._opponents = {}
+        for i, entry in enumerate(self.opponent_history):
+            self._index_opponent(entry, i)
+        self._whites = self._blacks = 0
+        self._last_color = None
+        self._color_streak = 0
+        for color in self.color_history:
+            self._count_color(color)
+
+    def _index_opponent(self, entry, position):
+        if entry in NON_GAME_ENTRIES or entry.endswith(FORFEIT_SUFFIX):
+            return
+        record = self._opponents.get(entry)
+        if record:
+            record[0] += 1
+            record[1] = position
+        else:
+            self._opponents[entry] = [1, position]
+
+    def _count_color(self, color):
+        # Updates the running color counts; rounds without a game ("N/A") don't break a streak.
+        if color == 'W':
+            self._whites += 1
+        elif color == 'B':
+            self._blacks += 1
+        else:
+            return
+        if color == self._last_color:
+            self._color_streak += 1
+        else:
+            self._last_color = color
+            self._color_streak = 1
+
+    def add_history(self, opponent_entry, color, points):
+        # Records one round in the histories and adds the points earned to the score, keeping the
+        # opponent index and color counters in sync. Always use this instead of appending to the lists directly.
+        self._index_opponent(opponent_entry, len(self.opponent_history))
+        self._count_color(color)
+        self.history_version = next(_history_versions)
+        self.opponent_history.append(opponent_entry)
+        self.color_history.append(color)
+        self.points_history.append(points)
+        self.score += points
+
+    def add_game(self, opponent_name, color, points):
+        # add_history() for a game played over the board ('W' or 'B'). Scoring a round calls this
+        # for almost every player, so the index and color updates are done inline.
+        record = self._opponents.get(opponent_name)
+        if record:
+            record[0] += 1
+            record[1] = len(self.opponent_history)
+        else:
+            self._opponents[opponent_name] = [1, len(self.opponent_history)]
+        if color == 'W':
+            self._whites += 1
+        else:
+            self._blacks += 1
+        if color == self._last_color:
+            self._color_streak += 1
+        else:
+            self._last_color = color
+            self._color_streak = 1
+        self.history_version = next(_history_versions)
+        self.opponent_history.append(opponent_name)
+        self.color_history.append(color)
+        self.points_history.append(points)
+        self.score += points
+
+    def times_played(self, opponent_name):
+        # Returns how many games this player has played against the named opponent.
+        record = self._opponents.get(opponent_name)
+        return record[0] if record else 0
+
+    def last_played(self, opponent_name):
+        # Returns the history position of the last game against the named opponent, or -1 if never played.
+        record = self._opponents.get(opponent_name)
+        return record[1] if record else -1
+
+    def pop_history(self):
+        # Removes the last round from the histories and takes its points back off the score.
+        # Returns the removed opponent entry.
+        entry = self.opponent_history.pop()
+        self.color_history.pop()
+        self.score -= self.points_history.pop() or 0.0
+        if entry in ABSENCE_ENTRIES:
+            self.absent_count -= 1
+        self._rebuild_history_index()
+        return entry
+
+    def replace_opponent(self, old_name, new_name):
+        # Renames an opponent everywhere in the history (including forfeits). Returns True if anything changed.
+        old_forfeit = old_name + FORFEIT_SUFFIX
+        if old_name not in self._opponents and old_forfeit not in self.opponent_history:
+            return False
+        renamed = {old_name: new_name, old_forfeit: new_name + FORFEIT_SUFFIX}
+        self.opponent_history[:] = [renamed.get(entry, entry) for entry in self.opponent_history]
+        self._rebuild_history_index()
+        return True
+
+    def opponent_names(self):
+        # Returns the names of everyone this player has met over the board.
+        return list(self._opponents)
+
+    def games(self):
+        # Returns (opponent name, points earned) for every game played over the board.
+        return [(entry, points) for entry, points in zip(self.opponent_history, self.points_history)
+                if entry not in NON_GAME_ENTRIES and not entry.endswith(FORFEIT_SUFFIX)]
+
+    def color_balance(self):
+        # Returns (games as White) - (games as Black).
+        return self._whites - self._blacks
+
+    def last_color(self):
+        # Returns the color of the last game played ('W' or 'B'), or None before the first game.
+        return self._last_color
+
+    def color_streak(self):
+        # Returns how many games in a row the player has had their last color.
+        return self._color_streak
+
+    def to_dict(self):
+        # Converts player object's attributes into a dictionary for JSON serialization.
+        return {
+            'name': self.name,
+            'school': self.school,
+            'is_active': self.is_active,
+            'score': self.score,
+            'opponent_history': self.opponent_history,
+            'color_history': self.color_history,
+            'points_history': self.points_history,
+            'absent_count': self.absent_count,
+            'had_pairing_bye': self.had_pairing_bye,
+            'round_joined': self.round_joined,
+            'player_id': self.player_id,
+            'rating': self.rating,
+            'team': self.team
+        }
+
+    def copy(self):
+        # Returns an independent copy, histories included (e.g. to pair on another thread).
+        return Player(self.name, self.school, self.is_active, self.score, list(self.opponent_history),
+                      list(self.color_history), self.absent_count, self.had_pairing_bye, self.round_joined,
+                      list(self.points_history), self.player_id, self.rating, self.team)
+
+    @classmethod
+    def from_dict(cls, data):
+        # Creates a Player object from a dictionary.
+        return cls(**data)
+
+    def __repr__(self):
+        return f"Player({self.name}, {self.school}, Score: {self.score})"
+
+class RosterIndex:
+    # Lookup tables for a roster: players by exact name, case-folded name and stable ID, and
+    # each bracket's members and active players. The Tournament keeps it up to date as players
+    # are added, removed, renamed and activated, so none of these lookups scan the roster.
+    def __init__(self, players=()):
+        self.rebuild(players)
+
+    def rebuild(self, players):
+        self.by_name = {}
+        self.by_folded_name = {}
+        self.by_id = {}
+        self.members = {} # bracket -> {player ID: player}, in roster order
+        self.active = {} # bracket -> set of active player IDs
+        # IDs are never reused, even after the player holding the highest one is removed
+        self.next_id = max(getattr(self, 'next_id', 1), 1 + max((p.player_id for p in players if p.player_id is not None), default=0))
+        for p in players:
+            self.add(p)
+
+    def add(self, player):
+        # Indexes a player, giving them a stable ID if they don't have one yet.
+        if player.player_id is None or player.player_id in self.by_id:
+            player.player_id = self.next_id
+        self.next_id = max(self.next_id, player.player_id + 1)
+        self.by_name[player.name] = player
+        self.by_folded_name[player.name.casefold()] = player
+        self.by_id[player.player_id] = player
+        self.members.setdefault(player.school, {})[player.player_id] = player
+        if player.is_active:
+            self.active.setdefault(player.school, set()).add(player.player_id)
+
+    def remove(self, player):
+        self.by_name.pop(player.name, None)
+        self.by_folded_name.pop(player.name.casefold(), None)
+        self.by_id.pop(player.player_id, None)
+        self.members.get(player.school, {}).pop(player.player_id, None)
+        self.active.get(player.school, set()).discard(player.player_id)
+
+    def rename(self, player, old_name):
+        self.by_name.pop(old_name, None)
+        self.by_folded_name.pop(old_name.casefold(), None)
+        self.by_name[player.name] = player
+        self.by_folded_name[player.name.casefold()] = player
+
+    def set_active(self, player):
+        # Updates the active sets after the player's is_active changed.
+        if player.is_active:
+            self.active.setdefault(player.school, set()).add(player.player_id)
+        else:
+            self.active.get(player.school, set()).discard(player.player_id)
+
+    def get(self, name):
+        return self.by_name.get(name)
+
+    def get_folded(self, name):
+        # Looks a name up ignoring case, e.g. to catch duplicates like "alice" and "Alice".
+        return self.by_folded_name.get(name.casefold())
+
+    def bracket_players(self, bracket):
+        return list(self.members.get(bracket, {}).values())
+
+    def active_players(self, bracket):
+        members = self.members.get(bracket, {})
+        return [members[player_id] for player_id in self.active.get(bracket, ())]
+
+class PairingCancelled(Exception):
+    # Raised when a pairing run is stopped through its cancel event.
+    pass
+
+def _check_cancel(cancel):
+    if cancel is not None and cancel.is_set():
+        raise PairingCancelled()
+
+def active_players_for_round(players, current_round):
+    # Returns the players who are active and have joined by the given round.
+    return [p for p in players if p.is_active and p.round_joined <= current_round]
+
+def pair_bracket(players_in_bracket, current_round, rng=None, mode=GREEDY, cancel=None, warnings=None):
+    # Implements the Swiss-style pairing algorithm for a given bracket.
+    # Returns (pairings, bye_player, active_players); pairings are uncolored (p1, p2) tuples.
+    # If the 'cancel' event (a threading.Event) gets set, it stops with PairingCancelled.
+    # If a pairing rule had to be broken, a message saying so is added to the 'warnings' list.
+    if mode not in PAIRING_MODES:
+        raise ValueError(f"Unknown pairing mode '{mode}'.")
+    rng = rng or random
+    # Filter for active players who joined by the current round
+    initial_active_players = active_players_for_round(players_in_bracket, current_round)
+
+    if len(initial_active_players) < 2:
+        return [], initial_active_players[0] if initial_active_players else None, initial_active_players
+
+    # The team, color and bye rules for this round (see constraints.py)
+    rules = PairingConstraints(initial_active_players)
+    while True:
+        # Step 1: Determine Bye Player (if odd number of players). Players who haven't had a bye
+        # come first, then those leaving a bracket that can be paired under the rules, then lowest
+        # score, then alphabetically; the next one is tried if the rest of the bracket still can't
+        # be paired without breaking a rule.
+        bye_candidates = rules.bye_candidates()[:BYE_CANDIDATES_TRIED] if len(initial_active_players) % 2 else [None]
+        for bye_player in bye_candidates:
+            if rules.forced_breaks(bye_player):
+                continue # A rule would have to be broken whoever plays whom
+            players_pool_for_pairing = [p for p in initial_active_players if p is not bye_player]
+
+            # Step 2: Pair the remaining players with the chosen method
+            if mode == OPTIMAL:
+                pairings = _pair_optimal(players_pool_for_pairing, rng, rules, cancel)
+            elif mode in (RATED, ACCELERATED):
+                bonus = {}
+                if mode == ACCELERATED and current_round <= ACCELERATED_ROUNDS:
+                    bonus = _acceleration_bonus(initial_active_players)
+                pairings = _pair_rated(players_pool_for_pairing, rng, bonus, rules, cancel)
+            else:
+                pairings = _pair_greedy(players_pool_for_pairing, rng, rules, cancel)
+
+            # Step 3: Re-pair any boards that had to break a rule, if that's possible
+            pairings = rules.repair(pairings)
+            if pairings is not None:
+                broken = len(rules.broken(pairings, relaxed=True))
+                if broken and warnings is not None:
+                    descriptions = " or ".join(constraints.RULE_DESCRIPTIONS[rule] for rule in rules.relaxed_rules)
+                    warnings.append(f"The {initial_active_players[0].school} bracket can't be paired with {descriptions}; "
+                                    f"{broken} board(s) break that rule this round.")
+                return pairings, bye_player, initial_active_players
+
+        # Give up the first rule still in force, breaking it on as few boards as possible
+        rules, _ = rules.relaxed()
+
+class _ScorePool:
+    # The players still to be paired, bucketed by score, so the top score group and the groups
+    # below it are found without scanning (or copying) the whole pool for every pairing.
+    def __init__(self, players):
+        self.buckets = {} # score -> players with that score, in no particular order
+        self.position = {} # player -> index in their bucket
+        for p in players:
+            bucket = self.buckets.setdefault(p.score, [])
+            self.position[p] = len(bucket)
+            bucket.append(p)
+        self.scores = sorted(self.buckets, reverse=True) # Highest first; emptied groups are skipped
+        self.size = len(self.position)
+
+    def remove(self, player):
+        # Takes a player out of the pool in constant time (the bucket's last player fills the gap).
+        bucket = self.buckets[player.score]
+        index = self.position.pop(player)
+        last = bucket.pop()
+        if last is not player:
+            bucket[index] = last
+            self.position[last] = index
+        self.size -= 1
+
+    def groups(self):
+        # Yields the non-empty score groups, highest score first.
+        while not self.buckets[self.scores[0]]:
+            del self.scores[0]
+        for score in self.scores:
+            if self.buckets[score]:
+                yield self.buckets[score]
+
+def _pair_greedy(players_pool_for_pairing, rng, rules, cancel=None):
+    # Pairs the highest-scoring player with their best remaining opponent, one pair at a time.
+    pool = _ScorePool(players_pool_for_pairing)
+    pairings = []
+    while pool.size >= 2:
+        _check_cancel(cancel)
+        # Select a random player from the highest score group
+        p1 = rng.choice(next(pool.groups()))
+        pool.remove(p1)
+        p2 = _best_opponent(p1, pool, rng, rules)
+        pool.remove(p2)
+        pairings.append((p1, p2))
+    return pairings
+
+def _best_opponent(p1, pool, rng, rules):
+    # Finds p1's opponent. Everyone left scores at most what p1 does, so walking down the score
+    # groups visits them nearest score first: the first group with someone p1 hasn't played
+    # (and may play under the rules) gives the opponent. Only if p1 has played everyone left is
+    # it a rematch, with the nearest score, then the fewest and least recent games against p1.
+    # Ties are random. If the rules leave nobody, it's the nearest rematch anyway and
+    # PairingConstraints.repair() sorts the board out afterwards.
+    for group in pool.groups():
+        # Random picks are a cheap, fair way to find a fresh opponent when most of the group is
+        for _ in range(GREEDY_SAMPLE_TRIES):
+            p2 = group[rng.randrange(len(group))]
+            if not p1.times_played(p2.name) and rules.allows(p1, p2):
+                return p2
+        fresh = [p2 for p2 in group if not p1.times_played(p2.name) and rules.allows(p1, p2)]
+        if fresh:
+            return rng.choice(fresh)
+
+    nearest = []
+    for group in pool.groups():
+        nearest = [p2 for p2 in group if rules.allows(p1, p2)]
+        if nearest:
+            break
+    nearest = nearest or next(pool.groups())
+    rematch_key = lambda p2: (p1.times_played(p2.name), p1.last_played(p2.name))
+    best = min(map(rematch_key, nearest))
+    return rng.choice([p2 for p2 in nearest if rematch_key(p2) == best])
+
+def _rating_key(player):
+    # Sorts players by rating, highest first, with unrated players last.
+    return (player.rating is None, -(player.rating or 0))
+
+def _acceleration_bonus(active_players):
+    # Returns {player: virtual points} for the rated top half of the bracket's active players.
+    ranked = sorted(active_players, key=lambda p: _rating_key(p) + (p.name,))
+    return {p: ACCELERATION_POINTS for p in ranked[:len(ranked) // 2] if p.rating is not None}
+
+def _pair_rated(players_pool_for_pairing, rng, bonus, rules, cancel=None):
+    # Pairs each score group in rating order: the top half of the group meets the bottom half,
+    # first against first ("slide" pairing), so the favourites don't meet each other early.
+    # Players with virtual points from 'bonus' are grouped as if they had them. A player with
+    # no fresh opponent left in their group moves down to the next group, as does the lowest
+    # rated player of an odd group; only what is left at the bottom can end up in a rematch.
+    pairing_score = lambda p: p.score + bonus.get(p, 0.0)
+    # Shuffle before the stable sort so unrated players with equal scores are ordered randomly
+    players_to_pair = list(players_pool_for_pairing)
+    rng.shuffle(players_to_pair)
+    rank = {p: i for i, p in enumerate(sorted(players_to_pair, key=lambda p: (-pairing_score(p),) + _rating_key(p)))}
+    players_to_pair.sort(key=rank.get)
+
+    pairings = []
+    floaters = []
+    start = 0
+    while start < len(players_to_pair):
+        _check_cancel(cancel)
+        end = start + 1
+        while end < len(players_to_pair) and pairing_score(players_to_pair[end]) == pairing_score(players_to_pair[start]):
+            end += 1
+        # Players moved down from higher groups come first in the group
+        floaters = sorted(_slide_group(floaters + players_to_pair[start:end], pairings, rules), key=rank.get)
+        start = end
+
+    # Nobody left has a fresh opponent among the others: swap opponents with the nearest board
+    # where that makes both games fresh, or else take the rematch played least (and longest ago)
+    while floaters:
+        p1 = floaters.pop(0)
+        p2 = min(floaters, key=lambda p2: (not rules.allows(p1, p2), p1.times_played(p2.name), p1.last_played(p2.name)))
+        floaters.remove(p2)
+        if not ((p1.times_played(p2.name) or not rules.allows(p1, p2)) and _swap_opponents(p1, p2, pairings, rules)):
+            pairings.append((p1, p2))
+    return pairings
+
+def _swap_opponents(p1, p2, pairings, rules):
+    # Looks up the boards from the bottom for one whose players p1 and p2 can each take on
+    # without a rematch, and splits it into those two games. Returns True if it found one.
+    fresh = lambda p, opponent: not p.times_played(opponent.name) and rules.allows(p, opponent)
+    for k in range(len(pairings) - 1, -1, -1):
+        a, b = pairings[k]
+        for x, y in ((a, b), (b, a)):
+            if fresh(p1, x) and fresh(p2, y):
+                pairings[k] = (x, p1)
+                pairings.append((y, p2))
+                return True
+    return False
+
+def _slide_group(group, pairings, rules):
+    # Pairs one rating-ordered score group onto 'pairings'. Returns the players who move down.
+    floaters = [group.pop()] if len(group) % 2 else []
+    half = len(group) // 2
+    top, bottom = group[:half], group[half:]
+    paired = set()
+    first_free = 0 # Everyone in 'bottom' before this is already paired
+    for i, p1 in enumerate(top):
+        if p1 in paired:
+            continue
+        while first_free < len(bottom) and bottom[first_free] in paired:
+            first_free += 1
+        # The next unpaired player in the bottom half, or the nearest fresh one after them; if
+        # the whole bottom half has played p1, a lower player of the top half will do
+        candidates = (p2 for candidates in (bottom[first_free:], top[i + 1:]) for p2 in candidates)
+        p2 = next((p2 for p2 in candidates if p2 not in paired and not p1.times_played(p2.name) and rules.allows(p1, p2)), None)
+        if p2 is None:
+            floaters.append(p1)
+            continue
+        paired.update((p1, p2))
+        pairings.append((p1, p2))
+    floaters.extend(p for p in bottom if p not in paired)
+    return floaters
+
+def _color_due(player):
+    # Returns +1 if the player is due White, -1 if due Black, 0 if they have no preference.
+    balance = player.color_balance()
+    if balance == 0:
+        # Balanced players are due the opposite of their last color; only the direction counts
+        # here, so two players due the same color always clash however long their streaks
+        pull = _alternation_pull(player)
+        return (pull > 0) - (pull < 0)
+    return (balance < 0) - (balance > 0)
+
+def _alternation_pull(player):
+    # Positive when the player should get White to alternate from their last game, negative
+    # for Black, and larger the longer they've had the same color in a row.
+    if player.last_color() == 'W':
+        return -player.color_streak()
+    if player.last_color() == 'B':
+        return player.color_streak()
+    return 0
+
+def _pair_optimal(players_pool_for_pairing, rng, rules, cancel=None):
+    # Pairs the pool with a maximum-weight matching, so early choices can't force rematches
+    # later in the round. Each possible game is an edge whose weight drops with rematches,
+    # score gaps and clashing color needs.
+    # Shuffle before the stable sort so players with equal scores are ordered randomly
+    players_to_pair = list(players_pool_for_pairing)
+    rng.shuffle(players_to_pair)
+    players_to_pair.sort(key=lambda p: p.score, reverse=True)
+
+    # Big pools are cut into even-sized runs of neighbouring score groups and each run is
+    # matched on its own; games across a cut would need a big score gap anyway
+    pairings = []
+    start = 0
+    while start < len(players_to_pair):
+        _check_cancel(cancel)
+        end = _segment_end(players_to_pair, start)
+        pairings.extend(_match_segment(players_to_pair[start:end], rng, rules))
+        start = end
+
+    # Present the boards top-down like the greedy mode
+    pairings.sort(key=lambda pair: max(pair[0].score, pair[1].score), reverse=True)
+    return pairings
+
+def _segment_end(players_to_pair, start):
+    # Picks where the run starting at 'start' ends, preferring a cut between score groups.
+    remaining = len(players_to_pair) - start
+    if remaining <= MAX_SEGMENT_SIZE:
+        return len(players_to_pair)
+    for end in range(start + MAX_SEGMENT_SIZE, start + MAX_SEGMENT_SIZE // 2, -2):
+        if players_to_pair[end - 1].score != players_to_pair[end].score:
+            return end
+    return start + MAX_SEGMENT_SIZE
+
+def _match_segment(segment, rng, rules):
+    # Solves the maximum-weight matching for one score-ordered run of players.
+    n = len(segment)
+    if n < 2:
+        return []
+
+    half_points = [round(p.score * 2) for p in segment]
+    color_due = [_color_due(p) for p in segment]
+
+    if n <= FULL_GRAPH_LIMIT:
+        window = n - 1
+    else:
+        # Wide enough that everyone still has unplayed opponents nearby
+        rounds_played = max(len(p.opponent_history) for p in segment)
+        window = max(MIN_NEIGHBOUR_WINDOW, 2 * rounds_played + 8)
+
+    penalties = []
+    for i in range(n):
+        player_i = segment[i]
+        for j in range(i + 1, min(n, i + window + 1)):
+            gap = half_points[i] - half_points[j]
+            penalty = SCORE_GAP_PENALTY * gap * gap + rng.randrange(TIEBREAK_JITTER)
+            times_played = player_i.times_played(segment[j].name)
+            if times_played:
+                # Recent rematches cost more than old ones
+                penalty += REMATCH_PENALTY * times_played + REMATCH_RECENCY_PENALTY * (player_i.last_played(segment[j].name) + 1)
+            if color_due[i] != 0 and color_due[i] == color_due[j]:
+                penalty += COLOR_CLASH_PENALTY
+            if not rules.allows(player_i, segment[j]):
+                penalty += CONSTRAINT_PENALTY
+            penalties.append((i, j, penalty))
+
+    # Turn penalties into positive weights; max cardinality keeps everyone paired
+    ceiling = max(penalty for _, _, penalty in penalties) + 1
+    mate = max_weight_matching([(i, j, ceiling - penalty) for i, j, penalty in penalties], maxcardinality=True)
+
+    return [(segment[i], segment[j]) for i, j in enumerate(mate) if j > i]
+
+def assign_colors(pairings, rng=None):
+    # Assigns colors (White/Black) to players in each pairing based on color history.
+    rng = rng or random
+    colored_pairings = []
+    for p1, p2 in pairings:
+        p1_balance = p1.color_balance()
+        p2_balance = p2.color_balance()
+        p1_needs = color_needed(p1)
+        p2_needs = color_needed(p2)
+
+        # A player who has had the same color too many times in a row gets the other one
+        if p1_needs != p2_needs:
+            if p1_needs == 'W' or p2_needs == 'B':
+                white_player, black_player = p1, p2
+            else:
+                white_player, black_player = p2, p1
+        # Player with more past White games (stronger pull to Black) gets Black
+        elif p1_balance > p2_balance:
+            white_player, black_player = p2, p1
+        elif p2_balance > p1_balance:
+            white_player, black_player = p1, p2
+        else:
+            # If equal color balance, alternate from the last game played
+            p1_pull = _alternation_pull(p1)
+            p2_pull = _alternation_pull(p2)
+            if p1_pull > p2_pull:
+                white_player, black_player = p1, p2
+            elif p2_pull > p1_pull:
+                white_player, black_player = p2, p1
+            else:
+                # Still equal, randomize
+                white_player, black_player = rng.sample([p1, p2], 2)
+        colored_pairings.append((white_player, black_player))
+    return colored_pairings
+
+def pairings_to_data(colored_pairings, bye_player, active_players, warnings=()):
+    # Converts a bracket's colored pairings into the name-based form saved in 'pairings_data'.
+    # Warnings from pairing (see pair_bracket) are saved with them, if there are any.
+    data = {
+        'pairings': [(w.name, b.name) for w, b in colored_pairings],
+        'bye': bye_player.name if bye_player else None,
+        'active': [p.name for p in active_players]
+    }
+    if warnings:
+        data['warnings'] = list(warnings)
+    return data
+
+def _award_absence(player, history_entry):
+    # Scores an absence (only the first few are worth points) and records it in the histories.
+    points = ABSENT_BYE_POINTS if player.absent_count < MAX_SCORED_ABSENCES else 0.0
+    player.absent_count += 1
+    player.add_history(history_entry, "N/A", points)
+
+def encode_results(boards):
+    # Converts board dicts (see apply_round_results) into the (outcomes, absences) arrays taken
+    # by apply_round_arrays(): one outcome code and one set of absence bits per board.
+    outcomes = bytearray(OUTCOME_CODES.get(board['result'], NO_RESULT) for board in boards)
+    absences = bytearray((ABSENT_WHITE if board['absent_white'] else 0) | (ABSENT_BLACK if board['absent_black'] else 0)
+                         for board in boards)
+    return outcomes, absences
+
+def apply_round_results(players, boards, bye_players=()):
+    # Applies one round's results to the players, updating scores and histories.
+    # Each board is a dict with 'white', 'black', 'result' (an outcome code or None) and
+    # 'absent_white'/'absent_black' flags. bye_players holds each bracket's pairing bye (or None).
+    outcomes, absences = encode_results(boards)
+    return apply_round_arrays(players, [board['white'] for board in boards], [board['black'] for board in boards],
+                              outcomes, absences, bye_players)
+
+def apply_round_arrays(players, whites, blacks, outcomes, absences, bye_players=()):
+    # Applies one round's results given as parallel arrays, one item per board: the White and
+    # Black players, the outcome (a value from OUTCOME_CODES, or NO_RESULT) and the absence bits
+    # (ABSENT_WHITE | ABSENT_BLACK). Scores, absence counts and histories are updated in one pass.
+    # Returns the players who got a history entry this round.
+    for i, (outcome, absence) in enumerate(zip(outcomes, absences)):
+        if not (absence or NO_RESULT < outcome < len(GAME_POINTS)):
+            raise ValueError(f"Board {i+1} has no result and no absent player.")
+
+    # Reset had_pairing_bye for all players for the next round's calculation
+    for p in players:
+        p.had_pairing_bye = False
+
+    for white_p, black_p, outcome, absence in zip(whites, blacks, outcomes, absences):
+        if not absence:
+            # Both players were present, so score the game
+            white_points, black_points = GAME_POINTS[outcome]
+            white_p.add_game(black_p.name, 'W', white_points)
+            black_p.add_game(white_p.name, 'B', black_points)
+            continue
+
+        # One or both players are absent
+        if absence & ABSENT_WHITE:
+            _award_absence(white_p, "Absent" if white_p.is_active else "Inactive Bye")
+        if absence & ABSENT_BLACK:
+            _award_absence(black_p, "Absent" if black_p.is_active else "Inactive Bye")
+
+        # Award full point to the present player if opponent is absent
+        if absence == ABSENT_WHITE:
+            black_p.add_history(white_p.name + FORFEIT_SUFFIX, "N/A", WIN_POINTS)
+        elif absence == ABSENT_BLACK:
+            white_p.add_history(black_p.name + FORFEIT_SUFFIX, "N/A", WIN_POINTS)
+
+    # Every player on a board got exactly one entry above
+    updated = list(whites)
+    updated.extend(blacks)
+
+    # Handle assigned pairing byes
+    for bye_p in bye_players:
+        if bye_p and bye_p.is_active: # Only active players get points for pairing bye
+            bye_p.had_pairing_bye = True
+            bye_p.add_history("Pairing Bye", "N/A", PAIRING_BYE_POINTS)
+            updated.append(bye_p)
+
+    # Handle inactive players who were not part of any pairing
+    in_round = set(updated)
+    for p in players:
+        # If a player is inactive and wasn't explicitly part of a pairing or a pairing bye
+        if not p.is_active and p not in in_round:
+            _award_absence(p, "Inactive Bye")
+            updated.append(p)
+    return updated
+
+def bracket_standings(bracket_name, players, current_round, standings=None):
+    # Returns the bracket's players who joined by the current round, highest score first.
+    # With a Standings object (see standings.py), equal scores are ordered by tie-breaks.
+    bracket_players = [p for p in players if p.school == bracket_name and p.round_joined <= current_round]
+    if standings is None:
+        return sorted(bracket_players, key=lambda p: p.score, reverse=True)
+    standings.update(players)
+    return standings.ranked(bracket_players)
+
+def new_seed():
+    # Returns a fresh random seed for a new tournament.
+    return random.SystemRandom().getrandbits(SEED_BITS)
+
+def round_seed(seed, current_round):
+    # Derives a round's pairing seed from the tournament seed, so every round gets its own
+    # stream but the same tournament always pairs a round the same way.
+    return random.Random(f"{seed}/{current_round}").getrandbits(SEED_BITS)
+
+def bracket_rng(seed, current_round, bracket):
+    # Returns the random number generator for one bracket's pairings. The same seed, round and
+    # bracket always give the same stream, no matter which process does the pairing.
+    return random.Random(f"{seed}/{current_round}/{bracket}")
+
+def _pair_bracket_job(job, cancel=None):
+    # Pairs and colors one bracket. Runs in a worker process, so it gets plain data in and
+    # returns positions in the player list rather than Player objects (plus any warnings).
+    players_in_bracket, current_round, mode, seed, bracket = job
+    rng = bracket_rng(seed, current_round, bracket)
+    warnings = []
+    raw_pairings, bye, active_in_bracket = pair_bracket(players_in_bracket, current_round, rng, mode, cancel, warnings)
+    colored_pairings = assign_colors(raw_pairings, rng)
+    position = {id(p): i for i, p in enumerate(players_in_bracket)}
+    return ([(position[id(w)], position[id(b)]) for w, b in colored_pairings],
+            position[id(bye)] if bye else None,
+            [position[id(p)] for p in active_in_bracket],
+            warnings)
+
+def _pool_size(players_by_bracket, mode, workers):
+    # Returns how many worker processes to pair these brackets with, or 0 to pair them here.
+    # By default there is one per CPU, and none unless the round is big enough to gain from them.
+    workers = min(workers or os.cpu_count() or 1, len(players_by_bracket))
+    if workers < 2:
+        return 0
+    total_players = sum(len(players) for players in players_by_bracket.values())
+    return workers if total_players >= (PARALLEL_MIN_OPTIMAL_PLAYERS if mode == OPTIMAL else PARALLEL_MIN_PLAYERS) else 0
+
+def _pairing_settings():
+    # The module settings that change how brackets are paired (read at call time, so
+    # benchmarks that adjust them don't get stale cached pairings).
+    return (REMATCH_PENALTY, REMATCH_RECENCY_PENALTY, SCORE_GAP_PENALTY, COLOR_CLASH_PENALTY, TIEBREAK_JITTER,
+            FULL_GRAPH_LIMIT, MIN_NEIGHBOUR_WINDOW, MAX_SEGMENT_SIZE, ACCELERATED_ROUNDS, ACCELERATION_POINTS,
+            CONSTRAINT_PENALTY, BYE_CANDIDATES_TRIED, constraints.RULES, constraints.MAX_COLOR_STREAK,
+            constraints.BACKTRACK_MAX_PLAYERS, constraints.BACKTRACK_NODE_LIMIT)
+
+def bracket_fingerprint(players_in_bracket, current_round, mode, seed, bracket):
+    # Returns a digest of everything pairing a bracket depends on: the players in order, with
+    # their status, score, rating, team, bye flag and histories, plus the round, mode, seed and settings.
+    # Any roster or result change that could change the pairings changes the fingerprint.
+    digest = hashlib.blake2b(repr((_pairing_settings(), current_round, mode, seed, bracket)).encode(), digest_size=16)
+    for p in players_in_bracket:
+        digest.update(repr((p.name, p.is_active, p.round_joined, p.score, p.rating, p.team, p.had_pairing_bye,
+                            p.opponent_history, p.color_history)).encode())
+    return digest.digest()
+
+class PairingCache:
+    # Remembers the most recent brackets' pairings by bracket_fingerprint(), so asking for
+    # pairings again for a bracket whose state hasn't changed returns at once. Entries are
+    # positions in the bracket's player list (as _pair_bracket_job returns them), and the
+    # least recently used ones are dropped beyond 'size'. A change to the bracket changes its
+    # fingerprint, so stale entries are never returned and simply age out.
+    def __init__(self, size=PAIRING_CACHE_SIZE):
+        self.size = size
+        self._entries = OrderedDict()
+        self.hits = self.misses = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, fingerprint):
+        entry = self._entries.get(fingerprint)
+        if entry is None:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(fingerprint)
+        self.hits += 1
+        return entry
+
+    def put(self, fingerprint, entry):
+        self._entries[fingerprint] = entry
+        self._entries.move_to_end(fingerprint)
+        while len(self._entries) > self.size:
+            self._entries.popitem(last=False)
+
+    def clear(self):
+        self._entries.clear()
+
+def pair_brackets(players_by_bracket, current_round, mode=GREEDY, seed=0, workers=None, cache=None,
+                  progress=None, cancel=None):
+    # Pairs and colors several independent brackets, in parallel worker processes when it's
+    # worth it. Results only depend on the seed, not on how the work was split up.
+    # With a PairingCache, brackets whose state hasn't changed since they were last paired
+    # aren't paired again. progress(done, total) is called as brackets are finished, and
+    # setting the 'cancel' event stops pairing with PairingCancelled.
+    # Returns {bracket: (colored_pairings, bye_player, active_players, warnings)}.
+    jobs = [(players, current_round, mode, seed, bracket) for bracket, players in players_by_bracket.items()]
+    outputs = [None] * len(jobs)
+    fingerprints = []
+    if cache is not None:
+        fingerprints = [bracket_fingerprint(*job) for job in jobs]
+        outputs = [cache.get(fingerprint) for fingerprint in fingerprints]
+    todo = [i for i, output in enumerate(outputs) if output is None]
+    done = len(jobs) - len(todo)
+    if progress: progress(done, len(jobs))
+
+    def finished(i, output):
+        nonlocal done
+        outputs[i] = output
+        if cache is not None:
+            cache.put(fingerprints[i], output)
+        done += 1
+        if progress: progress(done, len(jobs))
+
+    pool_size = _pool_size({jobs[i][4]: jobs[i][0] for i in todo}, mode, workers)
+    if pool_size:
+        # Imported here: multiprocessing is slow to import and most rounds never need it
+        from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+        from concurrent.futures.process import BrokenProcessPool
+        pool = None
+        try:
+            pool = ProcessPoolExecutor(max_workers=pool_size)
+            pending = {pool.submit(_pair_bracket_job, jobs[i]): i for i in todo}
+            while pending:
+                _check_cancel(cancel)
+                completed, _ = wait(pending, timeout=PAIRING_POOL_POLL_SECONDS, return_when=FIRST_COMPLETED)
+                for future in completed:
+                    finished(pending.pop(future), future.result())
+        except (OSError, NotImplementedError, BrokenProcessPool):
+            pass # No worker processes available here, pair the rest in this process instead
+        finally:
+            if pool is not None:
+                # Don't wait for brackets still being paired if we were cancelled
+                pool.shutdown(wait=not (cancel is not None and cancel.is_set()), cancel_futures=True)
+    for i in todo:
+        if outputs[i] is None:
+            _check_cancel(cancel)
+            finished(i, _pair_bracket_job(jobs[i], cancel))
+
+    result = {}
+    for (players, _, _, _, bracket), (pair_positions, bye_position, active_positions, warnings) in zip(jobs, outputs):
+        colored_pairings = [(players[w], players[b]) for w, b in pair_positions]
+        bye_player = players[bye_position] if bye_position is not None else None
+        result[bracket] = (colored_pairings, bye_player, [players[i] for i in active_positions], list(warnings))
+    return result
+
+class PairingTask:
+    # One round's pairing, made by Tournament.start_pairings(). run() does the slow part and
+    # may be called on another thread; it works on its own copies of the players, so the
+    # roster can keep changing meanwhile. Poll 'finished' (and 'done'/'total' for progress),
+    # then hand the task to Tournament.finish_pairings() on the thread that owns the tournament.
+    def __init__(self, players_by_bracket, current_round, mode, seed, workers, cache, version):
+        self.players_by_bracket = players_by_bracket
+        self.current_round = current_round
+        self.mode = mode
+        self.seed = seed
+        self.workers = workers
+        self.cache = cache
+        self.version = version # The tournament's version when the players were copied
+        self.done = 0 # Brackets paired so far
+        self.total = len(players_by_bracket)
+        self.result = None # {bracket: (colored_pairings, bye_player, active_players, warnings)} once finished
+        self.error = None # The exception that stopped run(), if any (PairingCancelled if cancelled)
+        self.finished = False
+        self._cancel = threading.Event()
+
+    def run(self):
+        try:
+            self.result = pair_brackets(self.players_by_bracket, self.current_round, self.mode, self.seed,
+                                        self.workers, self.cache, self._progress, self._cancel)
+        except Exception as e:
+            self.error = e
+        finally:
+            self.finished = True
+
+    def _progress(self, done, total):
+        self.done = done
+
+    def cancel(self):
+        # Asks run() to stop as soon as possible; it finishes with a PairingCancelled error.
+        self._cancel.set()
+
+    def cancelled(self):
+        return isinstance(self.error, PairingCancelled)
+
+def format_standings(bracket_name, players, current_round, standings=None):
+    # Builds the printable standings text for one bracket, with tie-break columns if a
+    # Standings object is given.
+    standings_text = f"--- {bracket_name} Standings (Before Round {current_round}) ---\n"
+    if standings is not None:
+        standings_text += f"{'Name':<25} {'Score':>9}" + "".join(f" {TIEBREAK_LABELS[t]:>6}" for t in TIEBREAKS) + "\n"
+    for p in bracket_standings(bracket_name, players, current_round, standings):
+        status = " (Inactive)" if not p.is_active else ""
+        tiebreak_text = ""
+        if standings is not None:
+            tiebreak_text = "".join(f" {value:>6.2f}" for value in standings.tiebreaks(p).values())
+        standings_text += f"{p.name:<25} {p.score:>5.1f} pts{tiebreak_text}{status}\n"
+    return standings_text
+
+def format_bracket_report(bracket_name, players, current_round, colored_pairings, bye_player, standings=None):
+    # Builds the printable standings and pairings text for one bracket.
+    standings_text = format_standings(bracket_name, players, current_round, standings)
+    # Only include players who joined by the current round for standings display
+    bracket_players = bracket_standings(bracket_name, players, current_round, standings)
+
+    pairings_text = f"--- {bracket_name} Pairings for Round {current_round} ---\n"
+    pairings_text += f"{'Board':<7} {'White':<25} {'Black':<25}\n"
+    pairings_text += "-" * 60 + "\n"
+    for i, (white_player, black_player) in enumerate(colored_pairings):
+        pairings_text += f"{i+1:<7} {white_player.name:<25} {black_player.name:<25}\n"
+
+    if bye_player: pairings_text += f"\nBYE: {bye_player.name}\n"
+
+    inactive_players_in_bracket = [p for p in bracket_players if not p.is_active]
+    if inactive_players_in_bracket:
+        pairings_text += "\n--- Inactive Players (Auto Absent Bye) ---\n"
+        for p in inactive_players_in_bracket: pairings_text += f"- {p.name}\n"
+
+    return standings_text + "\n" + pairings_text
+
+class Tournament:
+    # Holds the whole tournament state (the same data the GUI imports and exports) and
+    # runs the round steps on it without any user interface.
+    #
+    # Every change made through these methods remembers the change that reverses it, so it can
+    # be undone. Changes are (kind, data) pairs, the same events storage.py journals; see
+    # apply_change(). Undoing a round doesn't need a copy of the tournament: its reverse is a
+    # small 'rollback_round' record naming the players whose histories got a new entry.
+    def __init__(self, players=None, current_round=1, pairings_data=None, brackets=None, pending_results=None,
+                 seed=None, round_seeds=None):
+        self.players = players if players is not None else []
+        self.current_round = current_round
+        self.pairings_data = pairings_data if pairings_data is not None else {} # Stores pairings for the current round
+        self.brackets = list(brackets) if brackets is not None else list(BRACKETS)
+        # Results entered so far for the current round: {bracket: {white player's name: result entry}}
+        self.pending_results = pending_results if pending_results is not None else {}
+        # All pairing randomness comes from the tournament seed, so saved rounds can be paired again exactly
+        self.seed = seed if seed is not None else new_seed()
+        self.round_seeds = dict(round_seeds) if round_seeds is not None else {} # {round: seed its pairings used}
+        self.pairing_cache = PairingCache() # Pairings of recently paired bracket states
+        self.version = 0 # Goes up with every change, so long-running work can tell if it's out of date
+        self.standings = Standings() # Cached tie-breaks for the standings
+        self.index = RosterIndex(self.players) # Use add_player/remove_player/set_status so it stays current
+        self.undo_stack = deque(maxlen=UNDO_LIMIT) # Changes that reverse the latest changes
+        self.redo_stack = deque(maxlen=UNDO_LIMIT)
+        self._reverse_into = None # Where reversing changes go during undo/redo
+
+    def to_dict(self):
+        # Converts the tournament into the dictionary saved in the .json files.
+        return {
+            'current_round': self.current_round,
+            'players': [p.to_dict() for p in self.players],
+            'pairings_data': self.pairings_data,
+            'brackets': self.bracket_names(),
+            'pending_results': self.pending_results,
+            'seed': self.seed,
+            'round_seeds': {str(r): seed for r, seed in self.round_seeds.items()}
+        }
+
+    def snapshot(self):
+        # Like to_dict(), but copies everything that later rounds modify in place, so the
+        # result can be written out on another thread while the tournament keeps changing.
+        data = self.to_dict()
+        for p_data in data['players']:
+            p_data['opponent_history'] = list(p_data['opponent_history'])
+            p_data['color_history'] = list(p_data['color_history'])
+            p_data['points_history'] = list(p_data['points_history'])
+        data['pairings_data'] = dict(self.pairings_data)
+        data['pending_results'] = {bracket: dict(entries) for bracket, entries in self.pending_results.items()}
+        return data
+
+    @classmethod
+    def from_dict(cls, data):
+        # Creates a Tournament from a loaded .json dictionary.
+        return cls([Player.from_dict(p_data) for p_data in data['players']],
+                   data['current_round'], data.get('pairings_data', {}), data.get('brackets'),
+                   data.get('pending_results'), data.get('seed'),
+                   {int(r): seed for r, seed in data.get('round_seeds', {}).items()})
+
+    def bracket_names(self):
+        # Returns every bracket: the configured ones first, then any other school found on the roster.
+        names = list(self.brackets)
+        for p in self.players:
+            if p.school not in names:
+                names.append(p.school)
+        return names
+
+    def find_player(self, name):
+        # Returns the player with the given name, or None.
+        return self.index.get(name)
+
+    def _remember(self, kind, **data):
+        # Stores the change that reverses the one just made.
+        self.version += 1
+        if self._reverse_into is not None:
+            self._reverse_into.append((kind, data))
+        else:
+            self.undo_stack.append((kind, data))
+            self.redo_stack.clear() # A new change makes the undone ones unreachable
+
+    def apply_change(self, kind, data):
+        # Applies a change given as (kind, data), as journaled by storage.py or stored for undo.
+        if kind == 'add_player':
+            self.add_player(Player.from_dict(data['player']), data.get('index'))
+        elif kind == 'remove_player':
+            player = self.find_player(data['name'])
+            if player:
+                self.remove_player(player)
+        elif kind == 'add_players':
+            self.add_players([Player.from_dict(p_data) for p_data in data['players']], data.get('indexes'))
+        elif kind == 'remove_players':
+            self.remove_players([p for p in map(self.find_player, data['names']) if p])
+        elif kind == 'set_status':
+            player = self.find_player(data['name'])
+            if player:
+                self.set_status(player, data['is_active'])
+        elif kind == 'rename_player':
+            player = self.find_player(data['name'])
+            if player:
+                self.rename_player(player, data['new_name'])
+        elif kind == 'pairings':
+            self.set_pairings(data['current_round'], data['pairings_data'], data.get('pending_results'), data.get('seed'))
+        elif kind == 'board_result':
+            self.set_pending_result(data['bracket'], data['entry'])
+        elif kind == 'clear_result':
+            self.clear_pending_result(data['bracket'], data['white'])
+        elif kind == 'submit_round':
+            self.submit_results(self.make_boards(data['entries']))
+        elif kind == 'apply_round':
+            self.apply_round(self._players_named(data['whites']), self._players_named(data['blacks']),
+                             bytearray(data['outcomes']), bytearray(data['absences']))
+        elif kind == 'rollback_round':
+            self.rollback_round(data)
+        else:
+            raise ValueError(f"Unknown change '{kind}'.")
+
+    def undo(self):
+        # Reverses the latest change. Returns the (kind, data) change that was applied, or None.
+        return self._step(self.undo_stack, self.redo_stack)
+
+    def redo(self):
+        # Makes the latest undone change again. Returns the (kind, data) change that was applied, or None.
+        return self._step(self.redo_stack, self.undo_stack)
+
+    def _step(self, from_stack, to_stack):
+        if not from_stack:
+            return None
+        kind, data = from_stack.pop()
+        self._reverse_into = to_stack
+        try:
+            self.apply_change(kind, data)
+        finally:
+            self._reverse_into = None
+        return kind, data
+
+    def add_player(self, player, index=None):
+        # Adds a player to the roster (at the end unless an index is given).
+        if index is None or index >= len(self.players):
+            self.players.append(player)
+            self.index.add(player)
+        else:
+            self.players.insert(index, player)
+            self.index.rebuild(self.players) # Keeps the bracket members in roster order
+        self._remember('remove_player', name=player.name)
+
+    def remove_player(self, player):
+        index = self.players.index(player)
+        self.players.pop(index)
+        self.index.remove(player)
+        self._remember('add_player', player=player.to_dict(), index=index)
+
+    def add_players(self, players, indexes=None):
+        # Adds many players as one change (e.g. a registration file), so they are undone
+        # together. They go at the end unless 'indexes' gives each one's roster position.
+        if indexes is None:
+            for player in players:
+                self.players.append(player)
+                self.index.add(player)
+        else:
+            for index, player in sorted(zip(indexes, players), key=lambda item: item[0]):
+                self.players.insert(index, player)
+            self.index.rebuild(self.players)
+        self._remember('remove_players', names=[p.name for p in players])
+
+    def remove_players(self, players):
+        # Removes many players as one change.
+        removing = {id(p) for p in players}
+        removed = [(index, p) for index, p in enumerate(self.players) if id(p) in removing]
+        self.players[:] = [p for p in self.players if id(p) not in removing]
+        for _, player in removed:
+            self.index.remove(player)
+        self._remember('add_players', players=[p.to_dict() for _, p in removed], indexes=[index for index, _ in removed])
+
+    def set_status(self, player, is_active):
+        # Marks a player active or inactive for future pairings.
+        self._remember('set_status', name=player.name, is_active=player.is_active)
+        player.is_active = is_active
+        self.index.set_active(player)
+
+    def rename_player(self, player, new_name):
+        # Renames a player and every reference to them: other players' histories, the current
+        # pairings and any results entered for them. Their stable ID doesn't change.
+        other = self.index.get_folded(new_name)
+        if other and other is not player:
+            raise ValueError(f"A player named '{other.name}' already exists.")
+        old_name = player.name
+        player.name = new_name
+        self.index.rename(player, old_name)
+        for p in self.players:
+            p.replace_opponent(old_name, new_name)
+        # New dictionaries rather than edits in place, since an autosave may be writing the old ones
+        renamed = lambda name: new_name if name == old_name else name
+        self.pairings_data = {bracket: data and {'pairings': [(renamed(w), renamed(b)) for w, b in data['pairings']],
+                                                 'bye': renamed(data['bye']),
+                                                 'active': [renamed(name) for name in data['active']]}
+                              for bracket, data in self.pairings_data.items()}
+        self.pending_results = {bracket: {renamed(white): dict(entry, white=renamed(entry['white']), black=renamed(entry['black']))
+                                          for white, entry in entries.items()}
+                                for bracket, entries in self.pending_results.items()}
+        self._remember('rename_player', name=new_name, new_name=old_name)
+
+    def set_pairings(self, current_round, pairings_data, pending_results=None, seed=None):
+        # Replaces the current round's pairings (and any results entered for them). 'seed' is
+        # the seed the pairings were generated with, if known.
+        self._remember('pairings', current_round=self.current_round, pairings_data=self.pairings_data,
+                       pending_results=self.pending_results, seed=self.round_seeds.get(current_round))
+        self.current_round = current_round
+        self.pairings_data = pairings_data
+        self.pending_results = pending_results if pending_results is not None else {}
+        if seed is not None:
+            self.round_seeds[current_round] = seed
+        else:
+            self.round_seeds.pop(current_round, None)
+
+    def pairing_seed(self, current_round=None):
+        # Returns the seed a round is (or was) paired with: the one recorded when it was paired,
+        # otherwise the round's share of the tournament seed.
+        current_round = current_round or self.current_round
+        return self.round_seeds.get(current_round, round_seed(self.seed, current_round))
+
+    def generate_pairings(self, mode=GREEDY, seed=None, workers=None):
+        # Pairs every bracket for the current round, replacing any existing pairings.
+        # Brackets are independent, so big events pair them in parallel (see pair_brackets).
+        # The tournament's seed decides the pairings unless another seed is given, so pairing
+        # the same round again gives exactly the same result.
+        # Returns {bracket: (colored_pairings, bye_player)}.
+        task = self.start_pairings(mode, seed, workers, copy_players=False)
+        task.run()
+        return self.finish_pairings(task)
+
+    def start_pairings(self, mode=GREEDY, seed=None, workers=None, copy_players=True):
+        # Returns a PairingTask for the current round without running it (see generate_pairings).
+        # By default the task pairs copies of the players, so it can run on another thread.
+        if seed is None:
+            seed = round_seed(self.seed, self.current_round)
+        players_by_bracket = {bracket: [] for bracket in self.bracket_names()}
+        for p in self.players:
+            players_by_bracket[p.school].append(p.copy() if copy_players else p)
+        return PairingTask(players_by_bracket, self.current_round, mode, seed, workers, self.pairing_cache, self.version)
+
+    def finish_pairings(self, task):
+        # Makes a finished PairingTask's pairings the current round's pairings.
+        # Raises the task's error if it failed (PairingCancelled if it was cancelled), and
+        # ValueError if the tournament changed while it ran.
+        if task.error:
+            raise task.error
+        if task.version != self.version:
+            raise ValueError("The tournament changed while the pairings were being made. Please generate them again.")
+        player_map = self.index.by_name # The task may have paired copies; use the roster's own players
+        pairings_data = {}
+        result = {}
+        for bracket, (colored_pairings, bye, active_in_bracket, warnings) in task.result.items():
+            colored_pairings = [(player_map[w.name], player_map[b.name]) for w, b in colored_pairings]
+            bye = player_map[bye.name] if bye else None
+            # Save the colored pairings (by player name) for persistence
+            pairings_data[bracket] = pairings_to_data(colored_pairings, bye, active_in_bracket, warnings)
+            result[bracket] = (colored_pairings, bye)
+        self.set_pairings(task.current_round, pairings_data, seed=task.seed)
+        return result
+
+    def pairing_warnings(self):
+        # Returns the warnings from pairing the current round (e.g. a rule that had to be broken).
+        return [warning for data in self.pairings_data.values() if data for warning in data.get('warnings', ())]
+
+    def bracket_pairings(self, bracket):
+        # Rebuilds (colored_pairings, bye_player) for a bracket from the saved pairings data.
+        data = self.pairings_data.get(bracket)
+        if not data:
+            return [], None
+        player_map = self.index.by_name
+        colored_pairings = []
+        for w_name, b_name in data['pairings']:
+            white_player = player_map.get(w_name)
+            black_player = player_map.get(b_name)
+            if white_player and black_player:
+                colored_pairings.append((white_player, black_player))
+            else:
+                print(f"Warning: Player not found for pairing {w_name} vs {b_name}")
+        bye_player = player_map.get(data['bye']) if data['bye'] else None
+        return colored_pairings, bye_player
+
+    def report(self):
+        # Returns the printable standings and pairings for every paired bracket.
+        sections = []
+        for bracket in self.bracket_names():
+            if bracket in self.pairings_data and self.pairings_data[bracket]:
+                colored_pairings, bye_player = self.bracket_pairings(bracket)
+                sections.append(format_bracket_report(bracket, self.players, self.current_round, colored_pairings, bye_player, self.standings))
+        return "\n".join(sections)
+
+    def set_pending_result(self, bracket, entry):
+        # Remembers a board's result before the round is submitted. The entry is a dict with the
+        # 'white' and 'black' names, 'result' (an outcome code or None) and the absence flags.
+        previous = self.pending_results.get(bracket, {}).get(entry['white'])
+        if previous:
+            self._remember('board_result', bracket=bracket, entry=previous)
+        else:
+            self._remember('clear_result', bracket=bracket, white=entry['white'])
+        self.pending_results.setdefault(bracket, {})[entry['white']] = entry
+
+    def clear_pending_result(self, bracket, white_name):
+        # Forgets the result entered for the board where the named player has White.
+        bracket_results = self.pending_results.get(bracket, {})
+        previous = bracket_results.pop(white_name, None)
+        if not bracket_results:
+            self.pending_results.pop(bracket, None)
+        if previous:
+            self._remember('board_result', bracket=bracket, entry=previous)
+
+    def make_boards(self, entries):
+        # Turns name-based result entries (as in set_pending_result) into board dicts with Player objects.
+        player_map = self.index.by_name
+        boards = []
+        for entry in entries:
+            white_player = player_map.get(entry['white'])
+            black_player = player_map.get(entry['black'])
+            if not white_player or not black_player:
+                raise ValueError(f"Player not found for pairing {entry['white']} vs {entry['black']}.")
+            boards.append({
+                'white': white_player,
+                'black': black_player,
+                'result': entry['result'],
+                'absent_white': entry['absent_white'],
+                'absent_black': entry['absent_black']
+            })
+        return boards
+
+    def _players_named(self, names):
+        # Looks up a list of player names, which must all be on the roster.
+        players = [self.index.get(name) for name in names]
+        if None in players:
+            raise ValueError(f"Player '{names[players.index(None)]}' not found.")
+        return players
+
+    def submit_results(self, boards):
+        # Applies a round's results (board dicts as for apply_round_results) and moves to the next round.
+        outcomes, absences = encode_results(boards)
+        self.apply_round([board['white'] for board in boards], [board['black'] for board in boards], outcomes, absences)
+
+    def apply_round(self, whites, blacks, outcomes, absences):
+        # Applies a round's results given as arrays (as for apply_round_arrays) and moves to the next round.
+        # This is the fast path for tools that already have results in board order.
+        bye_players = [self.index.get(data.get('bye')) for data in self.pairings_data.values() if data]
+        had_pairing_bye = [p.name for p in self.players if p.had_pairing_bye]
+        updated = apply_round_arrays(self.players, whites, blacks, outcomes, absences, bye_players)
+        # Undoing the round only needs to know who got a history entry, plus the bye flags
+        self._remember('rollback_round', round=self.current_round, pairings_data=self.pairings_data,
+                       pending_results=self.pending_results,
+                       results={'whites': [p.name for p in whites], 'blacks': [p.name for p in blacks],
+                                'outcomes': list(outcomes), 'absences': list(absences)},
+                       players=[p.name for p in updated],
+                       had_pairing_bye=had_pairing_bye)
+        self.current_round += 1
+        self.pairings_data = {} # Clear pairings after results are submitted
+        self.pending_results = {}
+
+    def rollback_round(self, delta):
+        # Takes back a submitted round using the record apply_round() made, and restores its
+        # pairings and entered results, ready to be corrected and submitted again.
+        for name in delta['players']:
+            player = self.index.get(name)
+            if player:
+                player.pop_history()
+        had_pairing_bye = set(delta['had_pairing_bye'])
+        for p in self.players:
+            p.had_pairing_bye = p.name in had_pairing_bye
+        self.current_round = delta['round']
+        self.pairings_data = delta['pairings_data']
+        self.pending_results = delta['pending_results']
+        self._remember('apply_round', **delta['results'])
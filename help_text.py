@@ -0,0 +1,56 @@
+"""
+The text shown on the Help & Rules tab. It lives in its own module so the program only
+loads it when the tab is first opened.
+"""
+
+HELP_TEXT = """
+# --- HOW TO USE THE PROGRAM ---
+
+# 1.  Player Management Tab:
+#     - Add Players: Enter a player's name, select their school (Middle/High), and click "Add Player". New players can be added at any time. A rating is optional; it is only used by the "rated" and "accelerated" pairing modes. A team is optional too: players with the same team (e.g. a club or siblings) are never paired against each other.
+#     - Manage Players: Select a player from the list on the right. You can then mark them as "Inactive" (if they leave the club) or "Active". Inactive players will automatically receive absent byes and will not be present in any newly generated pairings.
+#     - Rename Player: Fixes a misspelled name. The player keeps their score and history, and other players' history against them is updated too.
+#     - Import/Export: Use the buttons to save your current tournament progress to a .json file or load a previous tournament. ALWAYS export your progress when you are done.
+#     - Import Players: Adds everyone listed in a .csv file, such as a sign-up sheet saved from Excel or Google Sheets. Put one player per row with a "Name" column and, optionally, "School", "Active", "Round Joined", "Rating" and "Team" columns. Rows without a school use the school selected above. Names already on the roster are skipped, and one Undo removes the whole import.
+
+# 2.  Tournament Tab:
+#     - Generate Pairings: Once players are added, click "Generate Pairings for Next Round". This will use the pairing logic to create matches for both brackets. Large brackets can take a moment: a progress bar and a "Cancel" button appear while the pairings are being made, and the rest of the program keeps working.
+#     - View Pairings & Enter Results: The pairings will appear in the text boxes. You can copy this text to a Google Doc. Below the pairings, controls will appear to enter results.
+#     - Mark Absences: For players who did not show up, check the "Absent" box next to their name.
+#     - Submit Results: After setting all results (Win/Loss/Draw) and marking any absences, click "Submit Results & Finalize Round". This will calculate scores, update player histories, and prepare for the next round.
+#     - Undo / Redo (Ctrl+Z / Ctrl+Y): Reverses or repeats your last changes, including adding or deleting players, entered results and generated pairings. Undoing a submitted round brings back its pairings and results so you can correct a mistake and submit again.
+
+# --- PAIRING LOGIC PRIORITY ---
+
+# The program uses a Swiss-style pairing system with the following priorities:
+
+# 1.  Score Matching: Players are primarily paired against others in the same score group. The system works down from the top score.
+# 2.  Opponent History: The system prioritizes pairing players who have NOT played each other before. If no such pairing is possible, it will allow a rematch and favor opponents played least often or least recently.
+# 3.  Color Balancing: The system tries to give players the color they have played less. If they have played an equal number of games as White and Black, it will try to alternate from their last game. Nobody gets the same color three times in a row.
+#     Teams and colors are strict rules: if a bracket can only be paired by breaking one (e.g. almost everyone is on the same team), the color rule is relaxed for that round first, then the team rule, and a warning says how many boards had to break it (as few as possible).
+# 4.  Randomness: If multiple opponents are equally valid after the above rules, one is chosen randomly.
+
+# Pairing Mode (next to the Generate button):
+#     - greedy: Pairs the top player first, then the next, and so on. Fast, but late in a tournament it can run out of fresh opponents and force rematches.
+#     - optimal: Looks at the whole bracket at once and picks the set of games with the fewest rematches, smallest score gaps and best color balance. Recommended for long tournaments.
+#     - rated: Pairs each score group in rating order, with the top half of the group playing the bottom half (1st vs. the middle, 2nd vs. the one after, ...), so the strongest players don't meet too early. Players without a rating are placed below the rated ones. Recommended for big sections with ratings: the standings sort themselves out in fewer rounds.
+#     - accelerated: Like rated, but for the first 2 rounds the top half of the bracket by rating is paired as if it had 1 extra point, so the top players meet each other straight away. The extra point is only used for pairing and never counts toward scores or standings.
+
+# --- SCORING AND RULES ---
+
+# -   Win: 1.0 point
+# -   Draw: 0.5 points
+# -   Loss: 0.0 points
+# -   Pairing Bye: 1.0 point. This happens when there is an odd number of players. A player cannot receive a pairing bye two rounds in a row.
+# -   Absent Bye: 0.5 points. This is awarded when a player is marked "Absent". A player will only receive points for their first THREE absences. After that, absences are worth 0 points.
+# -   Inactive Players: Automatically receive absent byes each round.
+
+# --- STANDINGS AND TIE-BREAKS ---
+
+# Players on equal points are ranked by these tie-breaks, in order:
+# -   Buch (Buchholz): The total score of every opponent you have played.
+# -   MBuch (Median-Buchholz): Buchholz without your best and worst opponent.
+# -   SB (Sonneborn-Berger): The scores of the opponents you beat, plus half the scores of those you drew with.
+# -   Prog (Progressive): Your running score after each round, added up. Early wins count for more.
+# Byes, absences and forfeits count toward your score but not toward the tie-breaks.
+"""
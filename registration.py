@@ -0,0 +1,182 @@
+"""
+Bulk player registration from CSV files (e.g. a sign-up sheet exported from a spreadsheet).
+
+Each row is one player. With a header row the columns can come in any order and are found by
+name (case doesn't matter); without one they are taken in this order:
+
+    name, school (or section/bracket), active, round joined, rating, team
+
+Only the name is required. The school defaults to the one passed in, "active" accepts
+yes/no, true/false, 1/0 or active/inactive (blank means active), the round joined defaults
+to the tournament's current round and the rating and team are left out if blank.
+
+The file is read a chunk of rows at a time, so the program can stay responsive between
+chunks and very large files are never held in memory as text. Names are checked against
+the roster (and earlier rows) ignoring case, so "alice smith" isn't added twice, and every
+accepted player is added in one change that a single undo takes back.
+"""
+
+import csv
+
+from engine import Player
+
+CHUNK_ROWS = 500 # Rows read per read_chunk() call
+SNIFF_BYTES = 4096 # How much of the file is looked at to guess the delimiter
+MAX_LISTED_PROBLEMS = 10 # Problems spelled out in summary(); the rest are only counted
+
+# Header names accepted for each column
+COLUMNS = {
+    'name': ("name", "player", "player name", "full name"),
+    'school': ("school", "section", "bracket", "division"),
+    'active': ("active", "status", "is active"),
+    'round_joined': ("round joined", "round_joined", "joined", "round"),
+    'rating': ("rating", "elo", "uscf", "fide"),
+    'team': ("team", "club", "family"),
+}
+COLUMN_ORDER = ('name', 'school', 'active', 'round_joined', 'rating', 'team') # For files without a header row
+TRUE_VALUES = ("", "y", "yes", "true", "1", "active")
+FALSE_VALUES = ("n", "no", "false", "0", "inactive")
+
+def _find_columns(row):
+    # Returns {column: position} if the row is a header row, otherwise None.
+    names = [cell.strip().casefold().replace("_", " ") for cell in row]
+    columns = {}
+    for column, aliases in COLUMNS.items():
+        for alias in aliases:
+            if alias.replace("_", " ") in names:
+                columns[column] = names.index(alias.replace("_", " "))
+                break
+    return columns if 'name' in columns else None
+
+def parse_row(values, default_school, current_round):
+    # Turns one row's {column: text} into a Player. Raises ValueError if a value isn't valid.
+    name = values.get('name', "").strip()
+    if not name:
+        raise ValueError("the name is empty")
+    school = values.get('school', "").strip() or default_school
+    if not school:
+        raise ValueError("no school or section given")
+
+    active_text = values.get('active', "").strip().casefold()
+    if active_text in TRUE_VALUES:
+        is_active = True
+    elif active_text in FALSE_VALUES:
+        is_active = False
+    else:
+        raise ValueError(f"'{values['active'].strip()}' isn't a valid active flag (use yes or no)")
+
+    round_text = values.get('round_joined', "").strip()
+    round_joined = current_round
+    if round_text:
+        if not round_text.isdigit() or int(round_text) < 1:
+            raise ValueError(f"'{round_text}' isn't a valid round number")
+        round_joined = int(round_text)
+
+    rating_text = values.get('rating', "").strip()
+    rating = None
+    if rating_text:
+        try:
+            rating = float(rating_text)
+        except ValueError:
+            raise ValueError(f"'{rating_text}' isn't a valid rating") from None
+        if rating.is_integer():
+            rating = int(rating)
+
+    team = values.get('team', "").strip() or None
+    return Player(name, school, is_active=is_active, round_joined=round_joined, rating=rating, team=team)
+
+class RosterImport:
+    # Reads players from an open CSV file into a tournament. Call read_chunk() until it returns
+    # False (or read_all()), then commit() to add the accepted players as one change.
+    def __init__(self, tournament, f, default_school=None, chunk_rows=CHUNK_ROWS):
+        self.tournament = tournament
+        self.default_school = default_school
+        self.chunk_rows = chunk_rows
+        self.players = [] # Accepted so far, in file order
+        self.duplicates = [] # (line number, name) of rows naming a player who is already there
+        self.errors = [] # (line number, problem) of rows that couldn't be read
+        self.rows_read = 0 # Rows after the header, blank ones included
+        self._seen = {} # Case-folded names accepted from this file
+        self._columns = None
+        self._done = False
+
+        sample = f.read(SNIFF_BYTES)
+        f.seek(0)
+        try:
+            dialect = csv.Sniffer().sniff(sample, delimiters=",;\t")
+        except csv.Error:
+            dialect = csv.excel
+        self._reader = csv.reader(f, dialect)
+
+    def read_chunk(self):
+        # Reads the next chunk of rows. Returns True while there is more to read.
+        # Raises ValueError if the file isn't readable text or CSV.
+        if self._done:
+            return False
+        try:
+            return self._read_rows()
+        except csv.Error as e:
+            raise ValueError(f"Line {self._reader.line_num}: {e}") from None
+
+    def _read_rows(self):
+        for row in self._reader:
+            if self._columns is None:
+                self._columns = _find_columns(row)
+                if self._columns is not None:
+                    continue # A header row
+                self._columns = {column: i for i, column in enumerate(COLUMN_ORDER)}
+            self._read_row(self._reader.line_num, row)
+            self.rows_read += 1
+            if self.rows_read % self.chunk_rows == 0:
+                return True
+        self._done = True
+        return False
+
+    def read_all(self):
+        while self.read_chunk():
+            pass
+
+    def _read_row(self, line, row):
+        if not any(cell.strip() for cell in row):
+            return # Blank lines are common at the end of spreadsheet exports
+        values = {column: row[i] for column, i in self._columns.items() if i < len(row)}
+        try:
+            player = parse_row(values, self.default_school, self.tournament.current_round)
+        except ValueError as e:
+            self.errors.append((line, str(e)))
+            return
+        folded = player.name.casefold()
+        if folded in self._seen or self.tournament.index.get_folded(player.name):
+            self.duplicates.append((line, player.name))
+            return
+        self._seen[folded] = player
+        self.players.append(player)
+
+    def new_brackets(self):
+        # Returns the schools in the file that aren't brackets of the tournament yet.
+        brackets = self.tournament.bracket_names()
+        return sorted({p.school for p in self.players if p.school not in brackets})
+
+    def commit(self):
+        # Adds every accepted player to the tournament as one change. Returns them.
+        if self.players:
+            self.tournament.add_players(self.players)
+        return self.players
+
+    def summary(self):
+        # Returns a short report of what was (or will be) imported.
+        lines = [f"{len(self.players)} player(s) added."]
+        if self.duplicates:
+            lines.append(f"{len(self.duplicates)} already on the roster and skipped: " +
+                         ", ".join(name for _, name in self.duplicates[:MAX_LISTED_PROBLEMS]) +
+                         (", ..." if len(self.duplicates) > MAX_LISTED_PROBLEMS else ""))
+        if self.errors:
+            lines.append(f"{len(self.errors)} row(s) could not be read:")
+            lines.extend(f"  Line {line}: {problem}" for line, problem in self.errors[:MAX_LISTED_PROBLEMS])
+            if len(self.errors) > MAX_LISTED_PROBLEMS:
+                lines.append(f"  ...and {len(self.errors) - MAX_LISTED_PROBLEMS} more")
+        return "\n".join(lines)
+
+def open_csv(path):
+    # Opens a CSV file for RosterImport. Spreadsheet programs often start it with a byte order mark.
+    return open(path, 'r', encoding='utf-8-sig', newline='')
@@ -0,0 +1,402 @@
+"""
+Server mode: many tournaments behind one local HTTP/JSON API.
+
+    python server.py --data-dir events --port 8000
+
+Each tournament ("event") is saved in the data folder as <event>.json with its journal log
+(see storage.py), so every accepted change is on disk before the reply is sent. The most
+recently used events stay loaded; beyond --max-open the least recently used idle one is
+dropped from memory and loaded from its file again when it is next asked for.
+
+Requests for the same event are handled one at a time, in the order they arrive, so results
+entered from several laptops at once never overwrite each other. Different events don't
+wait for each other.
+
+Endpoints (request and reply bodies are JSON):
+
+    GET  /events                   list the events
+    POST /events                   create one: {"id": "spring-open", "brackets": ["Open", "U1200"]}
+    GET  /events/<id>              current round, brackets and roster
+    POST /events/<id>/players      add players: {"players": [{"name": ..., "school": ..., "rating": ..., "team": ...}]}
+    POST /events/<id>/pairings     pair the current round: {"mode": "optimal", "seed": 1234, "force": false}
+    GET  /events/<id>/pairings     the current pairings, any pairing rule they break and the results entered so far
+    POST /events/<id>/results      enter one board: {"bracket": ..., "white": ..., "result": "1-0", "round": 3}
+    POST /events/<id>/submit       finalize the round once every board has a result: {"round": 3}
+    GET  /events/<id>/standings    standings with tie-breaks
+
+Players are checked like the rows of a registration file (see registration.py), and the
+whole list is rejected if any of them isn't valid. Results use the same notation as cli.py
+("1-0", "0-1", "1/2", "+-", "-+", "--"), and a null result clears the board. The optional
+"round" makes a request fail if the event has already moved on to another round.
+Errors come back as {"error": "..."} with status 400 (bad request), 404 (no such event) or
+409 (not possible right now, e.g. submitting before every result is in).
+"""
+
+import argparse
+import json
+import os
+import re
+import sys
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import unquote, urlsplit
+
+import engine
+import registration
+import storage
+from cli import RESULT_CODES
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8000
+DEFAULT_DATA_DIR = "events"
+MAX_OPEN_EVENTS = 16 # Events kept loaded in memory
+MAX_BODY_BYTES = 16 * 2**20
+EVENT_ID = re.compile(r"[A-Za-z0-9_-]{1,64}$") # Event IDs are file names, so keep them plain
+EVENT_SUFFIX = ".json"
+
+# Result notation for each (outcome, absent_white, absent_black), the first spelling in RESULT_CODES
+RESULT_NOTATION = {}
+for code, value in RESULT_CODES.items():
+    RESULT_NOTATION.setdefault(value, code)
+
+class APIError(Exception):
+    # An error that is sent back to the client with an HTTP status.
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+class _OpenEvent:
+    def __init__(self, path):
+        self.path = path
+        self.journal = None # Loaded by the first request that uses the event
+        self.lock = threading.Lock() # Held by the request using the event
+        self.users = 0 # Requests using or waiting for the event; it isn't dropped while any are
+
+class EventStore:
+    # Keeps the most recently used events loaded and gives each request sole use of its event.
+    def __init__(self, data_dir, max_open=MAX_OPEN_EVENTS, durable=True):
+        self.data_dir = data_dir
+        self.max_open = max_open
+        self.durable = durable # fsync every change (see storage.Journal)
+        self._open = OrderedDict() # event ID -> _OpenEvent, least recently used first
+        self._lock = threading.Lock() # Guards _open
+        os.makedirs(data_dir, exist_ok=True)
+
+    def path(self, event_id):
+        return os.path.join(self.data_dir, event_id + EVENT_SUFFIX)
+
+    def event_ids(self):
+        # Returns the ID of every event in the data folder.
+        names = (name[:-len(EVENT_SUFFIX)] for name in os.listdir(self.data_dir) if name.endswith(EVENT_SUFFIX))
+        return sorted(name for name in names if EVENT_ID.match(name))
+
+    def create(self, event_id, tournament):
+        # Saves a new event. Raises APIError if the ID is taken.
+        with self._lock:
+            if event_id in self._open or os.path.exists(self.path(event_id)):
+                raise APIError(409, f"There is already an event called '{event_id}'.")
+            event = self._open[event_id] = _OpenEvent(self.path(event_id))
+            event.journal = storage.Journal.create(event.path, tournament, durable=self.durable)
+            self._evict()
+
+    @contextmanager
+    def use(self, event_id):
+        # Gives the caller the event's Journal (its 'tournament' is the event) once no other
+        # request is using it. Raises APIError if there is no such event.
+        with self._lock:
+            event = self._open.get(event_id)
+            if event is None:
+                if not EVENT_ID.match(event_id) or not os.path.exists(self.path(event_id)):
+                    raise APIError(404, f"There is no event called '{event_id}'.")
+                event = self._open[event_id] = _OpenEvent(self.path(event_id))
+            self._open.move_to_end(event_id)
+            event.users += 1
+        try:
+            with event.lock:
+                if event.journal is None:
+                    # Loaded here rather than under the store's lock, so other events don't wait for it
+                    event.journal, _ = storage.Journal.open(event.path, durable=self.durable)
+                try:
+                    yield event.journal
+                except OSError:
+                    # The change may be in memory but not on disk; load the event again next time
+                    event.journal.close()
+                    event.journal = None
+                    raise
+        finally:
+            with self._lock:
+                event.users -= 1
+                self._evict()
+
+    def _evict(self):
+        # Drops the least recently used idle events beyond max_open. Their changes are all in
+        # their journals already, so closing them is enough. Call with self._lock held.
+        for event_id in list(self._open):
+            if len(self._open) <= self.max_open:
+                break
+            event = self._open[event_id]
+            if event.users:
+                continue
+            del self._open[event_id]
+            if event.journal:
+                event.journal.close()
+
+    def close(self):
+        # Saves every loaded event to its file and closes its journal (on shutdown).
+        with self._lock:
+            for event in self._open.values():
+                with event.lock:
+                    if event.journal:
+                        event.journal.save()
+                        event.journal.close()
+                        event.journal = None
+            self._open.clear()
+
+def _check_round(tournament, body):
+    if body.get('round') is not None and body['round'] != tournament.current_round:
+        raise APIError(409, f"The event is on round {tournament.current_round}, not round {body['round']}.")
+
+def event_summary(journal, body):
+    tournament = journal.tournament
+    return 200, {
+        'current_round': tournament.current_round,
+        'brackets': tournament.bracket_names(),
+        'paired': bool(tournament.pairings_data),
+        'players': [{'name': p.name, 'school': p.school, 'is_active': p.is_active, 'score': p.score,
+                     'rating': p.rating, 'team': p.team} for p in tournament.players],
+    }
+
+def create_event(store, body):
+    event_id = body.get('id')
+    if not isinstance(event_id, str) or not EVENT_ID.match(event_id):
+        raise APIError(400, "The event needs an 'id' of up to 64 letters, digits, '-' or '_'.")
+    brackets = body.get('brackets')
+    if brackets is not None and not (isinstance(brackets, list) and brackets and all(isinstance(b, str) and b.strip() for b in brackets)):
+        raise APIError(400, "'brackets' must be a list of bracket names.")
+    store.create(event_id, engine.Tournament(brackets=brackets))
+    return 201, {'id': event_id}
+
+def add_players(journal, body):
+    tournament = journal.tournament
+    players_data = body.get('players')
+    if not isinstance(players_data, list) or not players_data:
+        raise APIError(400, "'players' must be a list of players.")
+    players = []
+    seen = set()
+    problems = []
+    for i, data in enumerate(players_data):
+        if not isinstance(data, dict):
+            problems.append(f"Player {i+1}: not an object")
+            continue
+        # Checked exactly like a registration file row
+        values = {key: str(value) for key, value in data.items() if value is not None}
+        try:
+            player = registration.parse_row(values, body.get('school'), tournament.current_round)
+        except ValueError as e:
+            problems.append(f"Player {i+1}: {e}")
+            continue
+        if player.name.casefold() in seen or tournament.index.get_folded(player.name):
+            problems.append(f"Player {i+1}: '{player.name}' is already on the roster")
+            continue
+        seen.add(player.name.casefold())
+        players.append(player)
+    if problems:
+        raise APIError(400, "No players were added. " + "; ".join(problems))
+    tournament.add_players(players)
+    journal.record('add_players', players=[p.to_dict() for p in players])
+    return 201, {'added': [p.name for p in players]}
+
+def show_pairings(journal, body):
+    tournament = journal.tournament
+    brackets = {}
+    for bracket, data in tournament.pairings_data.items():
+        if not data:
+            continue
+        entered = tournament.pending_results.get(bracket, {})
+        boards = []
+        for i, (white, black) in enumerate(data['pairings']):
+            entry = entered.get(white)
+            result = None
+            if entry:
+                result = RESULT_NOTATION.get((entry['result'], entry['absent_white'], entry['absent_black']))
+            boards.append({'board': i + 1, 'white': white, 'black': black, 'result': result})
+        brackets[bracket] = {'boards': boards, 'bye': data.get('bye'), 'warnings': data.get('warnings', [])}
+    return 200, {'round': tournament.current_round, 'brackets': brackets}
+
+def pair_round(journal, body, workers=None):
+    tournament = journal.tournament
+    if tournament.pairings_data and not body.get('force'):
+        raise APIError(409, f"Round {tournament.current_round} is already paired. Send \"force\": true to pair it again.")
+    mode = body.get('mode', engine.GREEDY)
+    if mode not in engine.PAIRING_MODES:
+        raise APIError(400, f"Unknown pairing mode '{mode}'. Modes: {', '.join(engine.PAIRING_MODES)}")
+    seed = body.get('seed')
+    if seed is not None and (not isinstance(seed, int) or isinstance(seed, bool)):
+        raise APIError(400, "'seed' must be a whole number.")
+    tournament.generate_pairings(mode=mode, seed=seed, workers=workers)
+    journal.record('pairings', current_round=tournament.current_round, pairings_data=tournament.pairings_data,
+                   seed=tournament.pairing_seed())
+    return show_pairings(journal, body)
+
+def enter_result(journal, body):
+    tournament = journal.tournament
+    _check_round(tournament, body)
+    bracket = body.get('bracket')
+    data = tournament.pairings_data.get(bracket) if isinstance(bracket, str) else None
+    if not data:
+        raise APIError(409 if not tournament.pairings_data else 400, f"The {bracket} bracket hasn't been paired this round.")
+    black_of = {white: black for white, black in data['pairings']}
+    white = body.get('white')
+    if white not in black_of:
+        raise APIError(400, f"'{white}' doesn't have White on any board in the {bracket} bracket.")
+    code = body.get('result')
+    if code is None:
+        tournament.clear_pending_result(bracket, white)
+        journal.record('clear_result', bracket=bracket, white=white)
+        return 200, {'bracket': bracket, 'white': white, 'result': None}
+    if code not in RESULT_NOTATION.values():
+        raise APIError(400, f"Unknown result '{code}'. Use one of: {', '.join(RESULT_NOTATION.values())}")
+    outcome, absent_white, absent_black = RESULT_CODES[code]
+    entry = {'white': white, 'black': black_of[white], 'result': outcome,
+             'absent_white': absent_white, 'absent_black': absent_black}
+    tournament.set_pending_result(bracket, entry)
+    journal.record('board_result', bracket=bracket, entry=entry)
+    return 200, {'bracket': bracket, 'white': white, 'result': code}
+
+def submit_round(journal, body):
+    tournament = journal.tournament
+    _check_round(tournament, body)
+    if not tournament.pairings_data:
+        raise APIError(409, "No pairings have been generated for this round.")
+    entries = []
+    missing = []
+    for bracket, data in tournament.pairings_data.items():
+        if not data:
+            continue
+        entered = tournament.pending_results.get(bracket, {})
+        for i, (white, black) in enumerate(data['pairings']):
+            entry = entered.get(white)
+            if not entry or not (entry['result'] or entry['absent_white'] or entry['absent_black']):
+                missing.append(f"{bracket} board {i+1}")
+            else:
+                entries.append(entry)
+    if missing:
+        raise APIError(409, "No result yet for " + ", ".join(missing) + ".")
+    tournament.submit_results(tournament.make_boards(entries))
+    journal.record('submit_round', entries=entries)
+    return 200, {'current_round': tournament.current_round}
+
+def standings(journal, body):
+    tournament = journal.tournament
+    brackets = {}
+    for bracket in tournament.bracket_names():
+        ranked = engine.bracket_standings(bracket, tournament.players, tournament.current_round, tournament.standings)
+        brackets[bracket] = [dict({'rank': i + 1, 'name': p.name, 'score': p.score, 'is_active': p.is_active},
+                                  **tournament.standings.tiebreaks(p)) for i, p in enumerate(ranked)]
+    return 200, {'before_round': tournament.current_round, 'brackets': brackets}
+
+# (method, action after /events/<id>) -> handler(journal, body)
+EVENT_ROUTES = {
+    ('GET', None): event_summary,
+    ('POST', 'players'): add_players,
+    ('GET', 'pairings'): show_pairings,
+    ('POST', 'pairings'): pair_round,
+    ('POST', 'results'): enter_result,
+    ('POST', 'submit'): submit_round,
+    ('GET', 'standings'): standings,
+}
+
+def handle_request(store, method, path, body, workers=None):
+    # Runs one API request. Returns (HTTP status, reply dictionary); raises APIError or ValueError.
+    parts = [unquote(part) for part in urlsplit(path).path.split("/") if part]
+    if parts == ["events"]:
+        if method == 'GET':
+            return 200, {'events': store.event_ids()}
+        if method == 'POST':
+            return create_event(store, body)
+    elif parts[:1] == ["events"] and len(parts) in (2, 3):
+        handler = EVENT_ROUTES.get((method, parts[2] if len(parts) == 3 else None))
+        if handler:
+            with store.use(parts[1]) as journal:
+                if handler is pair_round:
+                    return pair_round(journal, body, workers)
+                return handler(journal, body)
+    raise APIError(404, f"Unknown request: {method} {path}")
+
+class RequestHandler(BaseHTTPRequestHandler):
+    # Turns HTTP requests into handle_request() calls. The server has 'store' and 'workers' set.
+    def do_GET(self):
+        self._handle('GET')
+
+    def do_POST(self):
+        self._handle('POST')
+
+    def _handle(self, method):
+        try:
+            body = self._read_body() if method == 'POST' else {}
+            status, reply = handle_request(self.server.store, method, self.path, body, self.server.workers)
+        except APIError as e:
+            status, reply = e.status, {'error': str(e)}
+        except ValueError as e:
+            status, reply = 400, {'error': str(e)}
+        except Exception as e:
+            self.log_error("Error handling %s %s: %r", method, self.path, e)
+            status, reply = 500, {'error': f"The server couldn't complete the request: {e}"}
+        data = json.dumps(reply).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _read_body(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        if length > MAX_BODY_BYTES:
+            raise APIError(400, "The request is too big.")
+        raw = self.rfile.read(length) if length else b"{}"
+        try:
+            body = json.loads(raw)
+        except ValueError:
+            raise APIError(400, "The request body isn't valid JSON.") from None
+        if not isinstance(body, dict):
+            raise APIError(400, "The request body must be a JSON object.")
+        return body
+
+def make_server(store, host=DEFAULT_HOST, port=DEFAULT_PORT, workers=None):
+    # Returns a ThreadingHTTPServer for the store; call serve_forever() on it.
+    server = ThreadingHTTPServer((host, port), RequestHandler)
+    server.store = store
+    server.workers = workers
+    return server
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="server.py", description="Serve many tournaments over a local HTTP/JSON API.")
+    parser.add_argument("--data-dir", default=DEFAULT_DATA_DIR, help=f"Folder the events are saved in (default: {DEFAULT_DATA_DIR})")
+    parser.add_argument("--host", default=DEFAULT_HOST, help=f"Address to listen on (default: {DEFAULT_HOST}; use 0.0.0.0 for other computers on the network)")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT, help=f"Port to listen on (default: {DEFAULT_PORT})")
+    parser.add_argument("--max-open", type=int, default=MAX_OPEN_EVENTS, help=f"Events kept loaded in memory (default: {MAX_OPEN_EVENTS})")
+    parser.add_argument("--workers", type=int, help="Most worker processes to pair brackets with (default: one per CPU, for big rounds only; 1 = no parallelism)")
+    return parser
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    store = EventStore(args.data_dir, args.max_open)
+    try:
+        server = make_server(store, args.host, args.port, args.workers)
+    except OSError as e:
+        print(f"Error: Could not listen on {args.host}:{args.port}: {e}", file=sys.stderr)
+        return 1
+    print(f"Serving {os.path.abspath(args.data_dir)} on http://{args.host}:{args.port}/events (Ctrl+C to stop)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        store.close()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
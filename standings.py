@@ -0,0 +1,81 @@
+"""
+Standings with tie-breaks.
+
+Players on equal points are ranked by these tie-breaks, in order:
+
+* Buchholz: the sum of the current scores of every opponent met over the board.
+* Median-Buchholz: Buchholz without the best and worst opponent (once there are 3+ of them).
+* Sonneborn-Berger: the scores of beaten opponents plus half the scores of drawn opponents.
+* Progressive score: the sum of the player's running score after each round.
+
+Byes, absences and forfeits count toward a player's score but not toward these tie-breaks.
+
+A Standings object caches every player's tie-breaks. When standings are asked for again it
+only recomputes the players whose results changed and the players who have met them, since
+their Buchholz and Sonneborn-Berger depend on those opponents' scores. A player's results have
+changed when their history_version has (it changes with every change to their histories, so
+undoing a round and scoring it differently is noticed even if the score comes out the same).
+"""
+
+TIEBREAKS = ("buchholz", "median_buchholz", "sonneborn_berger", "progressive")
+TIEBREAK_LABELS = {"buchholz": "Buch", "median_buchholz": "MBuch", "sonneborn_berger": "SB", "progressive": "Prog"}
+
+class Standings:
+    # Keeps tie-break values for a roster up to date. Call update() with the whole roster
+    # before reading values or ranking players.
+    def __init__(self):
+        self._stamps = {} # name -> the player's history_version when the values were computed
+        self._values = {} # name -> tie-break values in TIEBREAKS order
+        self._met = {} # name -> opponents met, as of the last computation
+
+    def update(self, players):
+        # Recomputes the tie-breaks that changed since the last update. Returns the names recomputed.
+        by_name = {p.name: p for p in players}
+        changed = [name for name in self._stamps if name not in by_name] # Removed players
+        for p in players:
+            if self._stamps.get(p.name) != p.history_version:
+                changed.append(p.name)
+        dirty = set(changed)
+        for name in changed:
+            # Everyone who met a changed player has a changed opponent score
+            dirty.update(self._met.get(name, ()))
+            if name in by_name:
+                dirty.update(by_name[name].opponent_names())
+        for name in dirty:
+            player = by_name.get(name)
+            if player is None:
+                self._stamps.pop(name, None)
+                self._values.pop(name, None)
+                self._met.pop(name, None)
+                continue
+            self._values[name] = self._compute(player, by_name)
+            self._stamps[name] = player.history_version
+            self._met[name] = player.opponent_names()
+        return dirty
+
+    def _compute(self, player, by_name):
+        games = player.games()
+        opponent_scores = [by_name[opponent].score if opponent in by_name else 0.0 for opponent, _ in games]
+        buchholz = sum(opponent_scores)
+        median_buchholz = buchholz
+        if len(opponent_scores) >= 3:
+            median_buchholz -= max(opponent_scores) + min(opponent_scores)
+        # A win earns the opponent's whole score and a draw half of it
+        sonneborn_berger = sum(score * (points or 0.0) for score, (_, points) in zip(opponent_scores, games))
+        progressive = running_score = 0.0
+        for points in player.points_history:
+            running_score += points or 0.0
+            progressive += running_score
+        return (buchholz, median_buchholz, sonneborn_berger, progressive)
+
+    def tiebreaks(self, player):
+        # Returns the player's tie-breaks as a {name: value} dictionary.
+        return dict(zip(TIEBREAKS, self._values[player.name]))
+
+    def sort_key(self, player):
+        # Orders players by score, then tie-breaks (all highest first), then name.
+        return (-player.score,) + tuple(-value for value in self._values[player.name]) + (player.name,)
+
+    def ranked(self, players):
+        # Returns the given players (e.g. one bracket) in standings order.
+        return sorted(players, key=self.sort_key)
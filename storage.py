@@ -0,0 +1,237 @@
+"""
+Journaled save files for tournaments.
+
+A tournament is saved as a compact JSON snapshot (the same format as an exported .json file)
+plus an append-only log next to it ("<file>.log"). Every change while the tournament is open
+is written to the log as one small JSON line, so saving a board result costs the size of that
+result rather than the whole tournament. Every so often the log is folded into a snapshot kept
+beside the file ("<file>.snapshot"); the file itself only changes when it is saved on purpose
+(Journal.save() or save()), so changes the user chooses not to keep can still be thrown away.
+
+Snapshots are written to a temporary file and then swapped in, so a crash never leaves a half
+written snapshot behind, and a torn last line in the log is simply ignored when loading.
+Each log line carries a sequence number and the snapshot records the last one it includes,
+so events are never applied twice even if a crash hits in the middle of a compaction.
+
+BackgroundWriter writes snapshots on a worker thread; the program uses it for its autosave file.
+"""
+
+import json
+import os
+import tempfile
+import threading
+
+from engine import Tournament
+
+LOG_SUFFIX = ".log"
+SNAPSHOT_SUFFIX = ".snapshot"
+COMPACT_EVERY = 500 # Fold the log into a new snapshot after this many events
+AUTOSAVE_FILENAME = "autosave.json"
+
+def log_path(path):
+    return path + LOG_SUFFIX
+
+def snapshot_path(path):
+    return path + SNAPSHOT_SUFFIX
+
+def _remove(path):
+    if os.path.exists(path):
+        os.remove(path)
+
+def default_autosave_path():
+    # Returns where the program keeps its autosave file (in the user's home folder).
+    return os.path.join(os.path.expanduser("~"), ".chess_tournament_maker", AUTOSAVE_FILENAME)
+
+def write_snapshot(path, tournament, seq=0):
+    # Atomically replaces the snapshot at 'path' with the tournament's current state.
+    data = tournament.to_dict()
+    data['journal_seq'] = seq
+    write_data(path, data)
+
+def write_data(path, data):
+    # Atomically replaces the file at 'path' with the given tournament dictionary.
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=os.path.basename(path) + ".", suffix=".tmp")
+    try:
+        with os.fdopen(fd, 'w') as f:
+            json.dump(data, f, separators=(',', ':'))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+def read_log(path):
+    # Returns (events, valid_length): every complete event in the log and the byte length they
+    # cover. Anything after the first torn or unreadable line is ignored.
+    events = []
+    valid_length = 0
+    if not os.path.exists(path):
+        return events, valid_length
+    with open(path, 'rb') as f:
+        for line in f:
+            if not line.endswith(b"\n"):
+                break
+            try:
+                events.append(json.loads(line))
+            except ValueError:
+                break
+            valid_length += len(line)
+    return events, valid_length
+
+def apply_event(tournament, event):
+    # Replays one logged change on the tournament.
+    data = {key: value for key, value in event.items() if key not in ('seq', 'type')}
+    tournament.apply_change(event['type'], data)
+
+def load(path):
+    # Loads a tournament from its file (or the newer snapshot beside it) and replays any newer
+    # logged changes. Returns (tournament, seq of the last applied event, number of logged
+    # changes that weren't saved in the file itself).
+    with open(path, 'r') as f: data = json.load(f)
+    saved_seq = data.get('journal_seq', 0)
+    if os.path.exists(snapshot_path(path)):
+        with open(snapshot_path(path), 'r') as f: snapshot = json.load(f)
+        if snapshot.get('journal_seq', 0) > saved_seq:
+            data = snapshot
+    tournament = Tournament.from_dict(data)
+    seq = data.get('journal_seq', 0)
+    events, _ = read_log(log_path(path))
+    for event in events:
+        if event['seq'] <= seq:
+            continue # Already part of the snapshot
+        apply_event(tournament, event)
+        seq = event['seq']
+    return tournament, seq, seq - saved_seq
+
+def _last_seq(path):
+    # Returns the newest sequence number in the snapshot and log beside 'path' (0 if none).
+    seq = 0
+    if os.path.exists(snapshot_path(path)):
+        try:
+            with open(snapshot_path(path), 'r') as f: seq = json.load(f).get('journal_seq', 0)
+        except ValueError:
+            pass
+    events, _ = read_log(log_path(path))
+    return max([seq] + [event['seq'] for event in events])
+
+def save(path, tournament):
+    # Writes a fresh snapshot and clears the log; the plain "save everything" operation.
+    # The file takes the newest sequence number from the old snapshot and log, so if we crash
+    # before they are removed, load() ignores them rather than applying their events again.
+    # Returns that sequence number.
+    seq = _last_seq(path)
+    write_snapshot(path, tournament, seq)
+    _remove(log_path(path))
+    _remove(snapshot_path(path))
+    return seq
+
+class BackgroundWriter:
+    # Writes tournament snapshots on a worker thread so the caller never waits for the disk.
+    # If several snapshots arrive while one is being written, only the newest is written next.
+    def __init__(self):
+        self._condition = threading.Condition()
+        self._pending = None # (path, data) waiting to be written
+        self._stopped = False
+        self.last_error = None # The error from the last failed write, if any
+        self._thread = threading.Thread(target=self._run, name="BackgroundWriter", daemon=True)
+        self._thread.start()
+
+    def submit(self, path, data):
+        # Queues a snapshot (e.g. from Tournament.snapshot()) to be written to 'path'.
+        with self._condition:
+            self._pending = (path, data)
+            self._condition.notify()
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while self._pending is None and not self._stopped:
+                    self._condition.wait()
+                if self._pending is None:
+                    return
+                path, data = self._pending
+                self._pending = None
+            try:
+                os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+                write_data(path, data)
+                self.last_error = None
+            except Exception as e: # Not just OSError: a bad value in the snapshot mustn't stop the thread
+                self.last_error = e
+
+    def stop(self, flush=True):
+        # Stops the worker thread, first writing the last queued snapshot if flush is True.
+        with self._condition:
+            self._stopped = True
+            if not flush:
+                self._pending = None
+            self._condition.notify()
+        self._thread.join()
+
+class Journal:
+    # Appends changes to a tournament's log and compacts it into the snapshot beside the file
+    # now and then. Raises OSError if the log can't be written (e.g. a read-only folder).
+    def __init__(self, path, tournament, seq=0, durable=True):
+        self.path = path
+        self.tournament = tournament
+        self.seq = seq
+        self.durable = durable # fsync every event, so it survives a power cut
+        self.events_since_snapshot = 0
+        # Drop a torn line left by a crash so new events start on a clean line
+        events, valid_length = read_log(log_path(path))
+        self.events_since_snapshot = len(events)
+        self._log = open(log_path(path), 'ab')
+        self._log.truncate(valid_length)
+
+    @classmethod
+    def create(cls, path, tournament, durable=True):
+        # Starts a new journal at 'path' with the tournament's current state as the snapshot.
+        seq = save(path, tournament)
+        return cls(path, tournament, seq, durable)
+
+    @classmethod
+    def open(cls, path, durable=True):
+        # Loads the tournament at 'path' and keeps journaling to it.
+        # Returns (journal, number of logged events that were replayed).
+        tournament, seq, replayed = load(path)
+        return cls(path, tournament, seq, durable), replayed
+
+    def record(self, kind, **data):
+        # Appends one change to the log. The change must already be applied to the tournament.
+        self.seq += 1
+        event = {'seq': self.seq, 'type': kind}
+        event.update(data)
+        self._log.write(json.dumps(event, separators=(',', ':')).encode() + b"\n")
+        self._log.flush()
+        if self.durable:
+            os.fsync(self._log.fileno())
+        self.events_since_snapshot += 1
+        if self.events_since_snapshot >= COMPACT_EVERY:
+            self.compact()
+
+    def compact(self):
+        # Folds the log into a new snapshot beside the file. The snapshot goes first; if we
+        # crash before the log is cleared, the sequence numbers stop its events being applied again.
+        write_snapshot(snapshot_path(self.path), self.tournament, self.seq)
+        self._log.truncate(0)
+        self._log.flush()
+        self.events_since_snapshot = 0
+
+    def save(self):
+        # Writes the tournament to the file itself, so it no longer needs the snapshot or log.
+        write_snapshot(self.path, self.tournament, self.seq)
+        _remove(snapshot_path(self.path))
+        self._log.truncate(0)
+        self._log.flush()
+        self.events_since_snapshot = 0
+
+    def discard(self):
+        # Throws away every change since the file was last saved and closes the journal.
+        self._log.close()
+        _remove(log_path(self.path))
+        _remove(snapshot_path(self.path))
+
+    def close(self):
+        self._log.close()
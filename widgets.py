@@ -0,0 +1,212 @@
+"""
+Reusable widgets for the tournament window.
+
+The lists here show any number of items with only as many row widgets as fit on screen.
+Scrolling or loading new items doesn't create or destroy anything: the same rows are bound
+to the items that are now in view, so a roster of thousands of players or a round with
+hundreds of boards costs about the same as a dozen.
+"""
+
+import tkinter as tk
+import customtkinter as ctk
+
+import engine
+
+class VirtualRows(ctk.CTkFrame):
+    # Base class for a scrollable list of fixed-height rows that only builds widgets for the
+    # visible rows. Subclasses implement make_row() and bind_row(row, index, item).
+    def __init__(self, master, row_height, label_text=None, **kwargs):
+        super().__init__(master, **kwargs)
+        self.row_height = row_height
+        self.items = []
+        self.first = 0 # Index of the item shown in the top row
+        self.rows = [] # Pooled row widgets, top to bottom
+
+        self.grid_columnconfigure(0, weight=1)
+        self.grid_rowconfigure(1, weight=1)
+        if label_text:
+            ctk.CTkLabel(self, text=label_text).grid(row=0, column=0, columnspan=2, pady=(4, 0))
+        self.body = ctk.CTkFrame(self, fg_color="transparent")
+        self.body.grid(row=1, column=0, sticky="nsew")
+        self.scrollbar = ctk.CTkScrollbar(self, command=self._on_scrollbar)
+        self.scrollbar.grid(row=1, column=1, sticky="ns")
+        self.empty_label = ctk.CTkLabel(self.body, text="")
+
+        self.body.bind("<Configure>", lambda event: self._resize_pool())
+        self.bind_wheel(self.body)
+
+    def make_row(self):
+        raise NotImplementedError
+
+    def bind_row(self, row, index, item):
+        raise NotImplementedError
+
+    def bind_wheel(self, widget):
+        # Lets the mouse wheel scroll the list while the pointer is over 'widget'.
+        widget.bind("<MouseWheel>", self._on_wheel) # Windows and macOS
+        widget.bind("<Button-4>", lambda event: self.scroll(-3)) # Linux
+        widget.bind("<Button-5>", lambda event: self.scroll(3))
+
+    def _resize_pool(self):
+        # Makes sure there is exactly one row widget for every row that fits in the view.
+        visible = max(1, self.body.winfo_height() // self.row_height + 1)
+        while len(self.rows) < visible:
+            self.rows.append(self.make_row())
+        while len(self.rows) > visible:
+            self.rows.pop().destroy()
+        self._render()
+
+    def _visible_count(self):
+        return max(1, self.body.winfo_height() // self.row_height)
+
+    def _render(self):
+        # Binds the pooled rows to the items currently in view.
+        self.first = max(0, min(self.first, len(self.items) - self._visible_count()))
+        for position, row in enumerate(self.rows):
+            index = self.first + position
+            if index < len(self.items):
+                self.bind_row(row, index, self.items[index])
+                row.place(x=0, y=position * self.row_height + 2, relwidth=1.0)
+            else:
+                row.place_forget()
+        if self.items:
+            self.empty_label.place_forget()
+            self.scrollbar.set(self.first / len(self.items), min(1.0, (self.first + self._visible_count()) / len(self.items)))
+        else:
+            self.empty_label.place(relx=0.5, y=20, anchor="n")
+            self.scrollbar.set(0.0, 1.0)
+
+    def _on_scrollbar(self, *args):
+        # Handles the scrollbar's "moveto <fraction>" and "scroll <n> units|pages" commands.
+        if args[0] == "moveto":
+            self.first = int(float(args[1]) * len(self.items))
+            self._render()
+        elif args[0] == "scroll":
+            step = self._visible_count() if args[2] == "pages" else 1
+            self.scroll(int(args[1]) * step)
+
+    def _on_wheel(self, event):
+        self.scroll(-3 if event.delta > 0 else 3)
+
+    def scroll(self, rows):
+        self.first += rows
+        self._render()
+
+    def set_items(self, items, empty_text=""):
+        # Replaces the whole list, keeping the scroll position where possible.
+        self.items = list(items)
+        self.empty_label.configure(text=empty_text)
+        self._render()
+
+    def refresh_item(self, item):
+        # Re-draws a single item in place, if it is currently in view.
+        for position, row in enumerate(self.rows):
+            index = self.first + position
+            if index < len(self.items) and self.items[index] is item:
+                self.bind_row(row, index, item)
+
+class VirtualList(VirtualRows):
+    # A list of selectable text rows.
+    # render_row(item) returns the text for an item; on_select(item) is called when a row is clicked.
+    def __init__(self, master, render_row, on_select=None, row_height=52, **kwargs):
+        self.render_row = render_row
+        self.on_select = on_select
+        self.selected = None
+        super().__init__(master, row_height, **kwargs)
+
+    def make_row(self):
+        btn = ctk.CTkButton(self.body, text="", anchor="w", height=self.row_height - 4)
+        position = len(self.rows)
+        btn.configure(command=lambda: self._on_row_click(position))
+        self.bind_wheel(btn)
+        return btn
+
+    def bind_row(self, row, index, item):
+        color = "hover_color" if item is self.selected else "fg_color"
+        row.configure(text=self.render_row(item), fg_color=ctk.ThemeManager.theme["CTkButton"][color])
+
+    def _on_row_click(self, position):
+        index = self.first + position
+        if index < len(self.items):
+            self.select(self.items[index])
+            if self.on_select: self.on_select(self.items[index])
+
+    def set_items(self, items, empty_text=""):
+        # Replaces the whole list. The selection is kept if the item is still in it.
+        items = list(items)
+        if self.selected is not None and not any(item is self.selected for item in items):
+            self.selected = None
+        super().set_items(items, empty_text)
+
+    def select(self, item):
+        # Highlights an item (None clears the selection).
+        self.selected = item
+        self._render()
+
+class ResultRow(ctk.CTkFrame):
+    # The result-entry controls for one board. A row isn't tied to a board: bind_board() points
+    # it at a board dictionary ('white', 'black', 'result', 'absent_white', 'absent_black'),
+    # and anything entered is written straight back to that dictionary.
+    def __init__(self, master, on_change, **kwargs):
+        super().__init__(master, **kwargs)
+        self.on_change = on_change
+        self.board = None
+        self.result_var = tk.StringVar(value="TBD")
+        self.absent_white_var = tk.BooleanVar(); self.absent_black_var = tk.BooleanVar()
+
+        self.board_label = ctk.CTkLabel(self, text="", font=ctk.CTkFont(weight="bold"), width=40)
+        self.w_win = ctk.CTkRadioButton(self, text="", variable=self.result_var, value=engine.WHITE_WIN, command=self._on_result)
+        self.w_absent = ctk.CTkCheckBox(self, text="Absent", variable=self.absent_white_var, width=1, command=self._on_absence)
+        self.draw_btn = ctk.CTkRadioButton(self, text="Draw", variable=self.result_var, value=engine.DRAW, command=self._on_result)
+        self.b_win = ctk.CTkRadioButton(self, text="", variable=self.result_var, value=engine.BLACK_WIN, command=self._on_result)
+        self.b_absent = ctk.CTkCheckBox(self, text="Absent", variable=self.absent_black_var, width=1, command=self._on_absence)
+
+        self.board_label.pack(side="left", padx=(5, 10))
+        self.w_win.pack(side="left", padx=5, expand=True, fill='x'); self.w_absent.pack(side="left", padx=(0,15)); self.draw_btn.pack(side="left", padx=5)
+        self.b_win.pack(side="left", padx=15, expand=True, fill='x'); self.b_absent.pack(side="left", padx=(0,5))
+
+    def bind_board(self, board, index):
+        # Shows 'board' (Board index+1) in this row.
+        self.board = board
+        self.board_label.configure(text=f"B{index+1}:")
+        self.w_win.configure(text=f"{board['white'].name} (W)")
+        self.b_win.configure(text=f"{board['black'].name} (B)")
+        self.absent_white_var.set(board['absent_white'])
+        self.absent_black_var.set(board['absent_black'])
+        self.result_var.set(board['result'] or "TBD")
+        self._update_states()
+
+    def _update_states(self):
+        # Disables the result buttons while either player is marked absent.
+        state = "disabled" if self.board['absent_white'] or self.board['absent_black'] else "normal"
+        for widget in (self.w_win, self.draw_btn, self.b_win):
+            widget.configure(state=state)
+
+    def _on_result(self):
+        self.board['result'] = self.result_var.get()
+        self.on_change(self.board)
+
+    def _on_absence(self):
+        self.board['absent_white'] = self.absent_white_var.get()
+        self.board['absent_black'] = self.absent_black_var.get()
+        if self.board['absent_white'] or self.board['absent_black']:
+            self.board['result'] = None # Reset result if someone is marked absent
+            self.result_var.set("TBD")
+        self._update_states()
+        self.on_change(self.board)
+
+class ResultList(VirtualRows):
+    # The result-entry list for one bracket. Items are board dictionaries (see ResultRow), and
+    # on_change(board) is called whenever the user changes a board.
+    def __init__(self, master, on_change, row_height=44, **kwargs):
+        self.on_change = on_change
+        super().__init__(master, row_height, **kwargs)
+
+    def make_row(self):
+        row = ResultRow(self.body, on_change=self.on_change, height=self.row_height - 4)
+        for widget in [row] + row.winfo_children():
+            self.bind_wheel(widget)
+        return row
+
+    def bind_row(self, row, index, item):
+        row.bind_board(item, index)